@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('API_ASYNC_VIEWS', '1')
+os.environ.setdefault('APP_PROCESS', 'asgi')
 
 application = get_asgi_application()
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.metrics.MetricsMiddleware',
+    'posts.profiling.SlowRequestMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,16 +84,79 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Connection reuse depends on the process type, APP_PROCESS (web, asgi or
+# worker; app/asgi.py sets asgi). Each value below can be overridden with
+# DB_<NAME>, or for one process type with <APP_PROCESS>_DB_<NAME>, e.g.
+# WORKER_DB_CONN_MAX_AGE=0 or ASGI_DB_POOL_MAX_SIZE=20.
+#  - web: sync gunicorn workers serve one request at a time, so each keeps
+#    one persistent connection, health-checked before reuse.
+#  - asgi: async views run queries on changing threads, where persistent
+#    connections pile up; use psycopg's pool (CONN_MAX_AGE must be 0).
+#  - worker: job loops keep their connections for longer.
+# Pool sizes are per process: max_size * processes must fit max_connections.
+DB_CONNECTION_DEFAULTS = {
+    'web': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, 'POOL': False},
+    'asgi': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'POOL': True},
+    'worker': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'POOL': False},
+}
+DB_POOL_DEFAULTS = {'POOL_MIN_SIZE': 2, 'POOL_MAX_SIZE': 10, 'POOL_TIMEOUT': 10}
+
+
+def database_settings(process, environ):
+    """DATABASES['default'] for a process type, with environment overrides applied."""
+    defaults = {**DB_CONNECTION_DEFAULTS.get(process, DB_CONNECTION_DEFAULTS['web']), **DB_POOL_DEFAULTS}
+
+    def value(name):
+        raw = environ.get(f'{process.upper()}_DB_{name}', environ.get(f'DB_{name}'))
+        default = defaults[name]
+        if raw is None:
+            return default
+        return raw == '1' if isinstance(default, bool) else type(default)(raw)
+
+    pool = value('POOL')
+    return {
         'ENGINE': 'django.db.backends.postgresql',
-        'HOST': os.environ.get('DB_HOST'),
-        'NAME': os.environ.get('DB_NAME'),
-        'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS'),
+        'HOST': environ.get('DB_HOST'),
+        'NAME': environ.get('DB_NAME'),
+        'USER': environ.get('DB_USER'),
+        'PASSWORD': environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if pool else value('CONN_MAX_AGE'),
+        'CONN_HEALTH_CHECKS': value('CONN_HEALTH_CHECKS'),
+        'OPTIONS': {
+            'pool': {
+                'min_size': value('POOL_MIN_SIZE'),
+                'max_size': value('POOL_MAX_SIZE'),
+                'timeout': value('POOL_TIMEOUT'),
+            },
+        } if pool else {},
     }
+
+
+APP_PROCESS = os.environ.get('APP_PROCESS', 'web')
+
+DATABASES = {
+    'default': database_settings(APP_PROCESS, os.environ),
 }
 
+# Optional streaming replica for heavy reads (core.routers, posts.replicas):
+# safe requests to ReplicaReadMixin views read from DB_REPLICA_ALIAS, except
+# for users who wrote in the last DB_REPLICA_STICKY_SECONDS, so they see
+# their own changes despite replication lag. Those pins are kept in the
+# cache, so the replica is only used with a shared one (CACHE_URL below).
+DB_REPLICA_ALIAS = 'replica'
+DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES[DB_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASS', DATABASES['default']['PASSWORD']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -145,13 +210,112 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'posts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 }
 
+# Per-process locmem by default; set CACHE_URL (e.g. redis://redis:6379/0, as
+# docker-compose does) so all gunicorn workers and the job worker share cached
+# responses, their invalidation, auth tokens and replica pins. Features that
+# would serve stale data from a per-process cache stay off without it.
+SHARED_CACHE = bool(os.environ.get('CACHE_URL'))
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))},
+        },
+    }
+
+API_RESPONSE_CACHE_ENABLED = os.environ.get('API_RESPONSE_CACHE_ENABLED', '1' if SHARED_CACHE else '0') == '1'
+API_RESPONSE_CACHE_ALIAS = 'default'
+API_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('API_RESPONSE_CACHE_TIMEOUT', 60))
+
+# The 300 s token cache is only safe when every worker sees the invalidation;
+# without a shared backend tokens are cached per process for AUTH_TOKEN_LOCAL_TTL.
+AUTH_TOKEN_SHARED_CACHE = SHARED_CACHE
+AUTH_TOKEN_CACHE_ALIAS = 'default'
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300))
+AUTH_TOKEN_LOCAL_TTL = int(os.environ.get('AUTH_TOKEN_LOCAL_TTL', 5))
+
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 100))
+API_PAGINATION_INCLUDE_COUNT = os.environ.get('API_PAGINATION_INCLUDE_COUNT', '1') == '1'
+API_BULK_MAX_ITEMS = int(os.environ.get('API_BULK_MAX_ITEMS', 500))
+
+# Serve the hot read endpoints as async views (`posts.async_views`). Only
+# useful under an ASGI server; `app/asgi.py` turns it on.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '0') == '1'
+
+# /api/events/ (server-sent events). Under ASGI one poller per process reads
+# the history tables every SSE_POLL_INTERVAL seconds for all subscribers.
+# Under WSGI the endpoint answers 204 (EventSource then stops reconnecting)
+# unless SSE_WSGI_STREAMING is set; each stream then holds a sync worker,
+# polls on its own and ends after SSE_WSGI_TIMEOUT. Rows younger than
+# SSE_SAFETY_LAG seconds are held back so late commits are not skipped.
+SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 2))
+SSE_HEARTBEAT = 15
+SSE_RETRY_MS = 3000
+SSE_MAX_REPLAY = 1000
+SSE_QUEUE_SIZE = 1000
+SSE_WSGI_STREAMING = os.environ.get('SSE_WSGI_STREAMING', '0') == '1'
+SSE_WSGI_TIMEOUT = int(os.environ.get('SSE_WSGI_TIMEOUT', 25))
+SSE_SAFETY_LAG = float(os.environ.get('SSE_SAFETY_LAG', 2))
+
+# /api/sync/ leaves out changes younger than this many seconds, so rows
+# committed late with an earlier updated_at are picked up next time.
+SYNC_SAFETY_LAG = float(os.environ.get('SYNC_SAFETY_LAG', 2))
+
+# Per-view latency, SQL and response size metrics (`posts.metrics`), exposed
+# in Prometheus format at /metrics. Counters are per worker process and carry
+# a `pid` label: scrape every worker directly rather than through the load
+# balancer (which returns one worker per scrape) and sum over `pid`. Series
+# restart from zero with each worker. With METRICS_TOKEN set, /metrics
+# requires `Authorization: Bearer <token>`; outside DEBUG it is refused
+# without one.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Background jobs (`core.jobs`): image variants and search documents are
+# queued in the database and run by `manage.py run_worker`. JOBS_EAGER runs
+# them inline instead, e.g. when no worker is deployed. Failed jobs are
+# retried JOBS_MAX_ATTEMPTS times after JOBS_RETRY_BASE * 2^n seconds
+# (capped at JOBS_RETRY_MAX); running jobs older than JOBS_LOCK_TIMEOUT are
+# requeued, finished ones are deleted after JOBS_KEEP_DONE_HOURS.
+JOBS_EAGER = os.environ.get('JOBS_EAGER', '0') == '1'
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+JOBS_RETRY_BASE = 10
+JOBS_RETRY_MAX = 3600
+JOBS_LOCK_TIMEOUT = int(os.environ.get('JOBS_LOCK_TIMEOUT', 600))
+JOBS_KEEP_DONE_HOURS = 24
+
+# Opt-in detector (`posts.profiling`) logging requests over the query or
+# latency budget and repeated near-identical SQL. VIEW_BUDGETS overrides the
+# limits per view label, e.g. {'PostViewSet.list': {'max_queries': 6}}.
+# PROFILE_SAMPLE_RATE of sync requests run under cProfile; profiles of the
+# offenders among them are written to PROFILE_DIR.
+SLOW_REQUESTS = {
+    'ENABLED': os.environ.get('SLOW_REQUESTS_ENABLED', '0') == '1',
+    'MAX_QUERIES': int(os.environ.get('SLOW_REQUESTS_MAX_QUERIES', 20)),
+    'MAX_DURATION_MS': int(os.environ.get('SLOW_REQUESTS_MAX_DURATION_MS', 500)),
+    'REPEAT_THRESHOLD': int(os.environ.get('SLOW_REQUESTS_REPEAT_THRESHOLD', 5)),
+    'VIEW_BUDGETS': {},
+    'PROFILE_DIR': os.environ.get('SLOW_REQUESTS_PROFILE_DIR', ''),
+    'PROFILE_SAMPLE_RATE': float(os.environ.get('SLOW_REQUESTS_PROFILE_SAMPLE_RATE', 0)),
+}
+
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -160,3 +324,39 @@ CORS_ALLOWED_ORIGINS = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Resized copies of Post.image (bounding box in pixels). They are written
+# under MEDIA_ROOT/variants/ when an image is uploaded, or on first request.
+IMAGE_VARIANTS = {
+    'thumb': (480, 480),
+    'medium': (1024, 1024),
+}
+IMAGE_VARIANT_FORMAT = os.environ.get('IMAGE_VARIANT_FORMAT', 'WEBP')
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 80))
+IMAGE_VARIANTS_ON_UPLOAD = os.environ.get('IMAGE_VARIANTS_ON_UPLOAD', '1') == '1'
+
+# Media is served by `posts.media.serve_media`. With MEDIA_ACCESS='authenticated'
+# the API hands out image links signed for at least MEDIA_LINK_TTL seconds
+# (an <img> cannot send the token); other requests need an API token. There is
+# no session authentication. With MEDIA_OFFLOAD='x-accel' (nginx) or
+# 'x-sendfile' (Apache) Django only checks access and the web server sends
+# the file, e.g. for nginx:
+#   location /protected-media/ { internal; alias /app/media/; }
+MEDIA_ACCESS = os.environ.get('MEDIA_ACCESS', 'public')
+MEDIA_LINK_TTL = int(os.environ.get('MEDIA_LINK_TTL', 3600))
+MEDIA_SERVE_PREFIXES = ('post_images/', 'variants/')
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Policy for `manage.py prune_history`: history rows older than KEEP_DAYS
+# (0 keeps everything) are archived and removed, keeping one baseline row
+# per object; no-op updates and bursts of edits by the same user within
+# COLLAPSE_SAME_USER_MINUTES are compacted into the last one.
+HISTORY_RETENTION = {
+    'KEEP_DAYS': int(os.environ.get('HISTORY_KEEP_DAYS', 365)),
+    'COLLAPSE_NOOP': True,
+    'COLLAPSE_SAME_USER_MINUTES': int(os.environ.get('HISTORY_COLLAPSE_MINUTES', 10)),
+    'ARCHIVE_DIR': os.environ.get('HISTORY_ARCHIVE_DIR', os.path.join(BASE_DIR, 'history_archive')),
+    'BATCH_SIZE': int(os.environ.get('HISTORY_PRUNE_BATCH_SIZE', 500)),
+    'SLEEP': float(os.environ.get('HISTORY_PRUNE_SLEEP', 0)),
+}
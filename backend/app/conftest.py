@@ -0,0 +1 @@
+pytest_plugins = ['posts.pytest_plugin']
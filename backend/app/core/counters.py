@@ -0,0 +1,57 @@
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Post
+
+
+def counter_values(comment_model=Comment):
+    """Expressions computing every `Post.counter_fields` value from the comments table."""
+    comments = comment_model.objects.filter(post_id=OuterRef('pk')).order_by().values('post_id')
+    return {
+        'comment_count': Coalesce(Subquery(comments.annotate(total=Count('pk')).values('total')), 0),
+        'last_comment_at': Subquery(comments.annotate(last=Max('created_at')).values('last')),
+    }
+
+
+def comment_added(post_id, created_at):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + 1,
+        last_comment_at=Greatest(Coalesce('last_comment_at', Value(created_at)), Value(created_at)),
+    )
+
+
+def comment_removed(post_id):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, Value(0)),
+        last_comment_at=counter_values()['last_comment_at'],
+    )
+
+
+def recount(post_ids):
+    Post.objects.filter(pk__in=post_ids).update(**counter_values())
+
+
+def repair_counters(batch_size=1000, dry_run=False, progress=None):
+    """
+    Compare the stored counters with the comments table in batches of posts
+    and fix the ones that drifted. Returns the number of posts that were off.
+    """
+    expected = {f'expected_{name}': value for name, value in counter_values().items()}
+    last_id, drifted = 0, 0
+    while True:
+        rows = list(
+            Post.objects.filter(pk__gt=last_id).order_by('pk')
+            .annotate(**expected).values('pk', *Post.counter_fields, *expected)[:batch_size]
+        )
+        if not rows:
+            return drifted
+        last_id = rows[-1]['pk']
+        wrong = [
+            row['pk'] for row in rows
+            if any(row[name] != row[f'expected_{name}'] for name in Post.counter_fields)
+        ]
+        drifted += len(wrong)
+        if wrong and not dry_run:
+            recount(wrong)
+        if progress:
+            progress(last_id, drifted)
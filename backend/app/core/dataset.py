@@ -0,0 +1,162 @@
+import random
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import recount
+from .models import Comment, Post
+from .retention import HISTORY_META_FIELDS
+from .search import build_search_document
+
+User = get_user_model()
+
+SYNTHETIC_PREFIX = 'synthetic'
+
+WORDS = (
+    'serwer drukarka sieć konto hasło aplikacja raport faktura klient baza '
+    'danych logowanie błąd aktualizacja wdrożenie kopia zapasowa dostęp '
+    'uprawnienia monitor laptop poczta kalendarz integracja API wydajność'
+).split()
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """Let bulk_create keep explicit created_at/updated_at values."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed_users(count, rng=None, password=None):
+    """
+    Create up to `count` synthetic users. With `password` new users can log
+    in with it; it is hashed once and shared, since hashing is deliberately slow.
+    """
+    rng = rng or random.Random(0)
+    hashed = make_password(password) if password else None
+    existing = set(
+        User.objects.filter(username__startswith=f'{SYNTHETIC_PREFIX}_').values_list('username', flat=True)
+    )
+    users = [
+        User(username=f'{SYNTHETIC_PREFIX}_{i}', email=f'{SYNTHETIC_PREFIX}_{i}@example.com')
+        for i in range(count)
+        if f'{SYNTHETIC_PREFIX}_{i}' not in existing
+    ]
+    for user in users:
+        if hashed:
+            user.password = hashed
+        else:
+            user.set_unusable_password()
+    User.objects.bulk_create(users, batch_size=1000)
+    return list(User.objects.filter(username__startswith=f'{SYNTHETIC_PREFIX}_')[:count])
+
+
+@lru_cache(maxsize=None)
+def _history_fields(model):
+    history_model = model.history.model
+    return history_model, [
+        field.attname for field in history_model._meta.concrete_fields if field.name not in HISTORY_META_FIELDS
+    ]
+
+
+def history_row(instance, history_type, date, user_id=None, **changes):
+    """An unsaved history record of `instance` as of `date`, for bulk_create."""
+    history_model, fields = _history_fields(type(instance))
+    values = {name: getattr(instance, name) for name in fields}
+    values.update(changes)
+    return history_model(
+        **values, history_type=history_type, history_date=date, history_user_id=user_id,
+    )
+
+
+def seed_posts(count, users, comments_per_post=3, updates_per_post=0, batch_size=1000, days=730,
+               rng=None, progress=None):
+    """
+    Insert `count` posts with on average `comments_per_post` comments each,
+    spread over the last `days` days, in batches of `batch_size`. With
+    `updates_per_post` the posts also get history: a creation record and on
+    average that many status changes, plus a creation record per comment.
+    Returns the number of comments created.
+    """
+    rng = rng or random.Random(0)
+    statuses = [choice for choice, _ in Post.status_choices]
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+    created_comments = 0
+
+    with manual_timestamps(Post, Comment):
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            posts, contents, timelines = [], [], []
+            for _ in range(size):
+                created = now - timedelta(seconds=rng.random() * span)
+                nazwa = sentence(rng, rng.randint(3, 8))
+                opis = ''.join(f'<p>{sentence(rng, rng.randint(20, 60))}.</p>' for _ in range(rng.randint(1, 5)))
+                comments = [sentence(rng, rng.randint(5, 25)) for _ in range(rng.randint(0, comments_per_post * 2))]
+                timeline, changed = [(created, rng.choice(statuses))], created
+                for _ in range(rng.randint(0, updates_per_post * 2) if updates_per_post else 0):
+                    changed += (now - changed) * rng.random()
+                    timeline.append((changed, rng.choice(statuses)))
+                posts.append(Post(
+                    nazwa=nazwa,
+                    opis=opis,
+                    status=timeline[-1][1],
+                    przypisany_uzytkownik=rng.choice(users) if users and rng.random() < 0.9 else None,
+                    created_at=created,
+                    updated_at=timeline[-1][0],
+                    search_document=build_search_document(nazwa, opis, comments),
+                ))
+                contents.append(comments)
+                timelines.append(timeline)
+
+            with transaction.atomic():
+                Post.objects.bulk_create(posts)
+                batch = []
+                for post, comments in zip(posts, contents):
+                    for offset, content in enumerate(comments, start=1):
+                        created = post.created_at + timedelta(minutes=offset * rng.randint(1, 600))
+                        batch.append(Comment(
+                            post=post,
+                            author=rng.choice(users),
+                            content=content,
+                            created_at=created,
+                            updated_at=created,
+                        ))
+                Comment.objects.bulk_create(batch, batch_size=batch_size)
+                recount([post.pk for post in posts])
+
+                if updates_per_post:
+                    history = []
+                    for post, timeline in zip(posts, timelines):
+                        for index, (date, status) in enumerate(timeline):
+                            user_id = rng.choice(users).id if users else None
+                            history.append(history_row(
+                                post, '~' if index else '+', date, user_id, status=status, updated_at=date,
+                            ))
+                    Post.history.model.objects.bulk_create(history, batch_size=batch_size)
+                    Comment.history.model.objects.bulk_create(
+                        [history_row(comment, '+', comment.created_at, comment.author_id) for comment in batch],
+                        batch_size=batch_size,
+                    )
+            created_comments += len(batch)
+            if progress:
+                progress(start + size, count)
+
+    return created_comments
@@ -0,0 +1,89 @@
+import csv
+import json
+from datetime import timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Post
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = ('csv', 'ndjson')
+
+EXPORTS = {
+    'posts': {
+        'queryset': lambda: Post.objects.all(),
+        'fields': ['id', 'nazwa', 'opis', 'status', 'przypisany_uzytkownik_id', 'image',
+                   'created_at', 'updated_at'],
+        'since': 'updated_at',
+        'order': ('updated_at', 'id'),
+    },
+    'comments': {
+        'queryset': lambda: Comment.objects.all(),
+        'fields': ['id', 'post_id', 'author_id', 'content', 'created_at', 'updated_at'],
+        'since': 'updated_at',
+        'order': ('updated_at', 'id'),
+    },
+    'history': {
+        'queryset': lambda: Post.history.all(),
+        'fields': ['history_id', 'id', 'nazwa', 'opis', 'status', 'przypisany_uzytkownik_id',
+                   'image', 'created_at', 'updated_at', 'history_date', 'history_type',
+                   'history_user_id', 'history_change_reason'],
+        'since': 'history_date',
+        'order': ('history_date', 'history_id'),
+    },
+}
+
+
+def parse_since(value):
+    since = parse_datetime(value or '')
+    if since is None:
+        raise ValueError(value)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_rows(kind, since=None, chunk_size=DEFAULT_CHUNK_SIZE, using=None):
+    """
+    Yield the rows of `kind` as dicts, oldest change first, streamed from a
+    server-side cursor `chunk_size` rows at a time. `since` limits the
+    export to rows changed strictly after that moment; `using` reads from
+    another database alias, e.g. the replica.
+    """
+    spec = EXPORTS[kind]
+    queryset = spec['queryset']()
+    if using is not None:
+        queryset = queryset.using(using)
+    if since is not None:
+        queryset = queryset.filter(**{f"{spec['since']}__gt": since})
+    return queryset.order_by(*spec['order']).values(*spec['fields']).iterator(chunk_size=chunk_size)
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def render_csv(kind, rows):
+    fields = EXPORTS[kind]['fields']
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_plain(row[field]) for field in fields])
+
+
+def render_ndjson(kind, rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def render(kind, output_format, rows):
+    if output_format == 'csv':
+        return render_csv(kind, rows)
+    return render_ndjson(kind, rows)
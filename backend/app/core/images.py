@@ -0,0 +1,122 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+VARIANT_DIR = 'variants'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+class ImageVariantError(Exception):
+    pass
+
+
+def content_addressed_name(file, filename):
+    """`post_images/<name>.<content hash><ext>` for the contents of `file` (rewound afterwards)."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    stem, extension = os.path.splitext(os.path.basename(filename))
+    return f'post_images/{stem}.{digest.hexdigest()[:12]}{extension.lower()}'
+
+
+def post_image_path(instance, filename):
+    """
+    `upload_to` for Post.image: `post_images/<name>.<content hash><ext>`, so
+    a given URL always points at the same bytes and can be cached forever.
+    """
+    return content_addressed_name(instance.image, filename)
+
+
+def variant_sizes():
+    return getattr(settings, 'IMAGE_VARIANTS', {'thumb': (480, 480), 'medium': (1024, 1024)})
+
+
+def variant_format():
+    image_format = getattr(settings, 'IMAGE_VARIANT_FORMAT', 'WEBP').upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def variant_name(name, variant):
+    """`post_images/a.png` -> `variants/thumb/post_images/a.png.webp`."""
+    return f'{VARIANT_DIR}/{variant}/{name}.{EXTENSIONS[variant_format()]}'
+
+
+def source_name(name):
+    """Reverse of `variant_name`: returns (variant, original name) or None."""
+    parts = name.split('/', 2)
+    if len(parts) != 3 or parts[0] != VARIANT_DIR or parts[1] not in variant_sizes():
+        return None
+    original, dot, extension = parts[2].rpartition('.')
+    if not dot or extension != EXTENSIONS[variant_format()]:
+        return None
+    return parts[1], original
+
+
+def render_variant(source, size, image_format):
+    """Downscale an open image file to fit `size` and encode it."""
+    with Image.open(source) as image:
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale directly.
+        image.draft('RGB', size)
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha and image_format != 'JPEG' else 'RGB')
+        image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        output = BytesIO()
+        options = {'quality': getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)}
+        if image_format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options.update(method=4)
+        image.save(output, image_format, **options)
+        return output.getvalue()
+
+
+def ensure_variant(name, variant, force=False, storage=None):
+    """
+    Return the storage name of `variant` of image `name`, rendering and
+    saving it first if it is missing (or `force` is set).
+    """
+    storage = storage or default_storage
+    target = variant_name(name, variant)
+    if not force and storage.exists(target):
+        return target
+
+    image_format = variant_format()
+    try:
+        with storage.open(name, 'rb') as source:
+            data = render_variant(source, tuple(variant_sizes()[variant]), image_format)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        raise ImageVariantError(f'{name}: {exc}') from exc
+
+    if storage.exists(target):
+        storage.delete(target)
+    saved = storage.save(target, ContentFile(data))
+    if saved != target:
+        # Another worker wrote the same variant in the meantime.
+        storage.delete(saved)
+    return target
+
+
+def ensure_variants(name, force=False, storage=None):
+    return {variant: ensure_variant(name, variant, force, storage) for variant in variant_sizes()}
+
+
+def variant_urls(name, storage=None):
+    """
+    URLs of every variant of `name`. They are derived from the name alone,
+    so serializing a page does not touch the disk; variants that were not
+    generated yet are rendered on first request by `posts.media.serve_media`.
+    """
+    if not name:
+        return None
+    storage = storage or default_storage
+    return {variant: storage.url(variant_name(name, variant)) for variant in variant_sizes()}
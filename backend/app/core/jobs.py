@@ -0,0 +1,203 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Count, DurationField, F, Min, Sum
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def register(name, max_attempts=None):
+    """Decorator registering a job handler; the payload is passed as keyword arguments."""
+    def decorator(func):
+        HANDLERS[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, dedupe_key=None):
+    """
+    Queue job `name` in the caller's transaction, so it only becomes visible
+    to workers if the caller commits. With a `dedupe_key` a job that is
+    still queued under the same key is reused instead. With JOBS_EAGER the
+    handler runs inline instead (tests, single-process development).
+    """
+    if name not in HANDLERS:
+        raise KeyError(f'Nieznane zadanie: {name}')
+    payload = payload or {}
+    if _setting('JOBS_EAGER', False):
+        HANDLERS[name][0](**payload)
+        return None
+
+    max_attempts = HANDLERS[name][1] or _setting('JOBS_MAX_ATTEMPTS', 5)
+    job = Job(
+        name=name, payload=payload, dedupe_key=dedupe_key, max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if dedupe_key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.filter(dedupe_key=dedupe_key, status=Job.QUEUED).first()
+    return job
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: exponential with jitter, capped at JOBS_RETRY_MAX."""
+    delay = min(_setting('JOBS_RETRY_BASE', 10) * 2 ** (attempts - 1), _setting('JOBS_RETRY_MAX', 3600))
+    return delay / 2 + random.random() * delay / 2
+
+
+def claim(worker_id):
+    """
+    Lock the next due job for this worker, or return None. SKIP LOCKED lets
+    concurrent workers claim different rows without waiting on each other;
+    SQLite ignores it, but serializes writers anyway.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=timezone.now())
+            .order_by('run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.locked_by = worker_id
+        job.save(update_fields=['status', 'attempts', 'started_at', 'locked_by'])
+    return job
+
+
+def execute(job):
+    """Run a claimed job and record the outcome; failures are retried with `backoff`."""
+    handler = HANDLERS.get(job.name, (None, None))[0]
+    try:
+        if handler is None:
+            raise LookupError(f'Nieznane zadanie: {job.name}')
+        with transaction.atomic():
+            handler(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()[-4000:]
+        job.finished_at = timezone.now()
+        if handler is not None and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        else:
+            job.status = Job.FAILED
+        logger.warning('Zadanie %s nieudane (próba %s/%s)', job, job.attempts, job.max_attempts, exc_info=True)
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    try:
+        job.save(update_fields=['status', 'run_at', 'finished_at', 'last_error'])
+    except IntegrityError:
+        # Requeued while an identical job was queued meanwhile; that one covers it.
+        Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=job.finished_at)
+    return job.status
+
+
+def requeue_stale():
+    """Requeue jobs left running longer than JOBS_LOCK_TIMEOUT by a worker that died."""
+    cutoff = timezone.now() - timedelta(seconds=_setting('JOBS_LOCK_TIMEOUT', 600))
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=cutoff)
+    requeued = 0
+    for job in stale:
+        job.status = Job.QUEUED if job.attempts < job.max_attempts else Job.FAILED
+        job.run_at = timezone.now()
+        job.last_error = f'Przekroczony czas blokady ({job.locked_by})'
+        try:
+            job.save(update_fields=['status', 'run_at', 'last_error'])
+            requeued += 1
+        except IntegrityError:
+            Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now())
+    return requeued
+
+
+def prune_finished():
+    cutoff = timezone.now() - timedelta(hours=_setting('JOBS_KEEP_DONE_HOURS', 24))
+    return Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()[0]
+
+
+def _release_connection():
+    # Recycle broken or expired connections between jobs, as the request cycle
+    # does, but never inside a transaction (e.g. a test calling `work`).
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def work(stop, worker_id=None, burst=False, poll_interval=None):
+    """
+    Claim and run jobs until `stop` (a threading/multiprocessing Event) is
+    set, or with `burst` until no job is due. Returns the number of jobs run.
+    """
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    poll_interval = poll_interval if poll_interval is not None else _setting('JOBS_POLL_INTERVAL', 1.0)
+    processed, housekeeping = 0, 0.0
+    while not stop.is_set():
+        _release_connection()
+        try:
+            if time.monotonic() - housekeeping > 60:
+                housekeeping = time.monotonic()
+                requeue_stale()
+                prune_finished()
+            job = claim(worker_id)
+            if job is not None:
+                execute(job)
+        except DatabaseError:
+            # A job caught mid-way is picked up again by `requeue_stale`.
+            logger.exception('Błąd bazy danych w workerze %s', worker_id)
+            stop.wait(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        processed += 1
+    _release_connection()
+    return processed
+
+
+def queue_stats():
+    """
+    Job counts per (name, status), the age of the oldest due job and, per
+    name, count and total run time of the jobs finished in the last hour.
+    """
+    now = timezone.now()
+    counts = {
+        (row['name'], row['status']): row['total']
+        for row in Job.objects.order_by().values('name', 'status').annotate(total=Count('id'))
+    }
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    recent = (
+        Job.objects.filter(status=Job.DONE, finished_at__gte=now - timedelta(hours=1), started_at__isnull=False)
+        .order_by().values('name')
+        .annotate(total=Count('id'), spent=Sum(F('finished_at') - F('started_at'), output_field=DurationField()))
+    )
+    return {
+        'counts': counts,
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'durations': {row['name']: (row['total'], row['spent'].total_seconds()) for row in recent},
+    }
@@ -0,0 +1,170 @@
+import http.client
+import json
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': to_ms(percentile(latencies, 50)),
+        'p95_ms': to_ms(percentile(latencies, 95)),
+        'p99_ms': to_ms(percentile(latencies, 99)),
+        'max_ms': to_ms(latencies[-1] if latencies else None),
+    }
+
+
+def _connection(base):
+    parts = urlsplit(base)
+    cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=30)
+
+
+def login(base, username, password):
+    connection = _connection(base)
+    body = json.dumps({'username': username, 'password': password})
+    connection.request('POST', '/api/login/', body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    payload = json.loads(response.read() or b'{}')
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f'{base}: logowanie nieudane ({response.status})')
+    return payload['token']
+
+
+def get_json(base, path, headers):
+    connection = _connection(base)
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    payload = json.loads(response.read() or b'null')
+    connection.close()
+    return payload
+
+
+def run(base, paths, headers=None, concurrency=16, duration=10.0, warmup=1.0, method='GET', body=None):
+    """
+    Hit `paths` round-robin from `concurrency` keep-alive connections for
+    `duration` seconds (after `warmup` seconds that are not recorded) and
+    return `summarize()` of the 2xx/3xx latencies. `body` is sent with every
+    request, e.g. for `method='POST'`.
+    """
+    headers = dict(headers or {})
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+    start = time.perf_counter()
+    record_from = start + warmup
+    deadline = record_from + duration
+
+    def worker(offset):
+        connection = _connection(base)
+        local, failed, index = [], 0, offset
+        while True:
+            began = time.perf_counter()
+            if began >= deadline:
+                break
+            path = paths[index % len(paths)]
+            index += 1
+            try:
+                connection.request(method, path, body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = _connection(base)
+                ok = False
+            if began >= record_from:
+                if ok:
+                    local.append(time.perf_counter() - began)
+                else:
+                    failed += 1
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], duration)
+
+
+def run_request_cycles(threads, requests, using='default', query='SELECT 1', conn_max_age=None):
+    """
+    In-process model of `threads` sync workers serving `requests` requests
+    each: every request runs `query` between request_started and
+    request_finished, whose handlers close or keep the connection exactly as
+    for real requests. Returns `summarize()` plus the connections opened.
+    """
+    from django.core.signals import request_finished, request_started
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    lock = threading.Lock()
+    latencies, opened, failures = [], [0], []
+
+    def count(sender, connection, **kwargs):
+        if connection.alias == using:
+            with lock:
+                opened[0] += 1
+
+    def worker():
+        local = []
+        try:
+            for _ in range(requests):
+                began = time.perf_counter()
+                request_started.send(sender=None)
+                try:
+                    with connections[using].cursor() as cursor:
+                        cursor.execute(query)
+                        cursor.fetchall()
+                finally:
+                    request_finished.send(sender=None)
+                local.append(time.perf_counter() - began)
+        except Exception as exc:
+            with lock:
+                failures.append(exc)
+        finally:
+            connections[using].close()
+        with lock:
+            latencies.extend(local)
+
+    settings_dict = connections.settings[using]
+    saved = settings_dict['CONN_MAX_AGE']
+    if conn_max_age is not None:
+        settings_dict['CONN_MAX_AGE'] = conn_max_age
+    connection_created.connect(count, weak=False)
+    try:
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        connection_created.disconnect(count)
+        settings_dict['CONN_MAX_AGE'] = saved
+    if failures:
+        raise failures[0]
+    # With psycopg's pool connection_created fires on every checkout; the
+    # pool itself knows how many connections it really opened.
+    pool = getattr(connections[using], 'pool', None)
+    if pool is not None:
+        opened[0] = pool.get_stats().get('connections_num', opened[0])
+    return {**summarize(latencies, 0, elapsed), 'connections': opened[0]}
@@ -0,0 +1,131 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+from core.dataset import SYNTHETIC_PREFIX
+
+SCENARIOS = {
+    # name: (method, path)
+    'posts_list': ('GET', '/api/posts/'),
+    'posts_list_next_page': ('GET', '/api/posts/?count=0&cursor={cursor}'),
+    'posts_filter_status': ('GET', '/api/posts/?status=Aktywny'),
+    'posts_filter_user': ('GET', '/api/posts/?przypisany_uzytkownik={user}'),
+    'posts_search': ('GET', '/api/posts/?search={word}'),
+    'post_detail': ('GET', '/api/posts/{post}/'),
+    'post_comments': ('GET', '/api/posts/{post}/comments/'),
+    'post_history': ('GET', '/posts/{post}/history/'),
+    'login': ('POST', '/api/login/'),
+}
+COMPARED = ('rps', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        'Powtarzalny benchmark głównych endpointów uruchomionego serwera: każdy scenariusz osobno, '
+        'raport req/s i p50/p95/p99. Wyniki zapisuje jako posortowany JSON (--output), który można '
+        'porównywać między commitami (--compare). Dane testowe: generate_dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='http://localhost:8002')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), default=[],
+                            help='Domyślnie wszystkie')
+        parser.add_argument('--username', default=f'{SYNTHETIC_PREFIX}_0')
+        parser.add_argument('--password', default='benchmark')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Czas pomiaru scenariusza w sekundach')
+        parser.add_argument('--warmup', type=float, default=2.0)
+        parser.add_argument('--output', help='Zapisz wyniki jako JSON')
+        parser.add_argument('--compare', help='Plik JSON z poprzedniego uruchomienia do porównania')
+
+    def handle(self, *args, **options):
+        base = options['target'].rstrip('/')
+        if not base.startswith(('http://', 'https://')):
+            raise CommandError(f'Niepoprawny --target: {base}')
+        try:
+            token = loadtest.login(base, options['username'], options['password'])
+        except (OSError, RuntimeError) as exc:
+            raise CommandError(f'{exc} (czy uruchomiono generate_dataset?)')
+        headers = {'Authorization': f'Token {token}', 'Accept': 'application/json'}
+        values = self.sample_values(base, headers)
+
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            method, path = SCENARIOS[name]
+            body, request_headers = None, headers
+            if method == 'POST':
+                body = json.dumps({'username': options['username'], 'password': options['password']})
+                request_headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+            self.stdout.write(f'{name}: {method} {path.format(**values)}')
+            results[name] = loadtest.run(
+                base, [path.format(**values)], request_headers,
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+                method=method,
+                body=body,
+            )
+
+        report = {
+            'meta': {
+                'commit': self.commit(),
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'posts': values['total'],
+                'target': base,
+            },
+            'scenarios': results,
+        }
+        previous = self.load(options['compare']) if options['compare'] else None
+        self.print_table(results, previous)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+                output.write('\n')
+
+    def sample_values(self, base, headers):
+        page = loadtest.get_json(base, '/api/posts/?page_size=1', headers) or {}
+        results = page.get('results') or []
+        if not results:
+            raise CommandError(f'{base}: brak postów, najpierw uruchom generate_dataset.')
+        post = results[0]
+        cursor = (page.get('next') or '').partition('cursor=')[2].split('&')[0]
+        return {
+            'post': post['id'],
+            'user': (post.get('przypisany_uzytkownik') or {}).get('id', ''),
+            'word': post['nazwa'].split()[0].lower(),
+            'cursor': cursor,
+            'total': page.get('count'),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as source:
+                return json.load(source)['scenarios']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Nie można wczytać {path}: {exc}')
+
+    def print_table(self, results, previous):
+        self.stdout.write(f"\n{'scenariusz':<22}{'żądania':>9}{'błędy':>7}" +
+                          ''.join(f'{column:>16}' for column in COMPARED))
+        for name, result in results.items():
+            cells = []
+            for column in COMPARED:
+                value = result[column]
+                before = (previous or {}).get(name, {}).get(column)
+                if value is not None and before:
+                    cells.append(f'{value} ({(value - before) / before:+.0%})')
+                else:
+                    cells.append(str(value))
+            self.stdout.write(f"{name:<22}{result['requests']:>9}{result['errors']:>7}" +
+                              ''.join(f'{cell:>16}' for cell in cells))
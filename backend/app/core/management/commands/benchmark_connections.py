@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Porównuje liczbę nowych połączeń z bazą i opóźnienia przy CONN_MAX_AGE=0 oraz przy '
+        f'ustawieniach bieżącego procesu (APP_PROCESS={settings.APP_PROCESS}) dla współbieżnych żądań'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Żądań na wątek')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        configured = connections.settings[options['database']]
+        runs = [('CONN_MAX_AGE=0', 0)]
+        label = 'pula psycopg' if configured.get('OPTIONS', {}).get('pool') else (
+            f"CONN_MAX_AGE={configured['CONN_MAX_AGE']}"
+        )
+        runs.append((f'{label} ({settings.APP_PROCESS})', None))
+
+        self.stdout.write(f"{'konfiguracja':<32}{'połączenia':>12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, conn_max_age in runs:
+            result = loadtest.run_request_cycles(
+                options['threads'], options['requests'], using=options['database'], conn_max_age=conn_max_age,
+            )
+            self.stdout.write(
+                f"{name:<32}{result['connections']:>12}{result['rps']:>10}"
+                f"{result['p50_ms']!s:>10}{result['p99_ms']!s:>10}"
+            )
@@ -0,0 +1,102 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MANAGE = os.path.join(settings.BASE_DIR, 'manage.py')
+
+SEQUENCES = {
+    # name: (setup commands run one after another, gunicorn arguments)
+    'legacy': (
+        [['wait_for_db'], ['migrate'], ['init_data']],
+        # Gunicorn would otherwise pick up ./gunicorn.conf.py by itself.
+        ['-c', os.devnull, '--workers', '{workers}'],
+    ),
+    'current': (
+        [['prepare_app']],
+        ['-c', os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'), '--workers', '{workers}'],
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_http(url, process, timeout):
+    """Poll `url` until the server answers anything at all; seconds until then."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise CommandError(f'Serwer zakończył się z kodem {process.returncode}')
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return time.perf_counter() - started
+        except urllib.error.HTTPError:
+            return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.02)
+    raise CommandError(f'{url}: brak odpowiedzi po {timeout:.0f}s')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mierzy zimny start kontenera aplikacji: czas od uruchomienia kroków przygotowania bazy do '
+        'pierwszej odpowiedzi HTTP gunicorna, dla starej sekwencji (wait_for_db, migrate, init_data, '
+        'gunicorn) i obecnej (prepare_app, gunicorn z preload_app). Każdy krok to osobny proces, '
+        'jak w docker-compose; używa bieżącej bazy i DJANGO_SETTINGS_MODULE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sequence', action='append', choices=sorted(SEQUENCES), default=[],
+                            help='Domyślnie wszystkie')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--path', default='/metrics', help='Adres sprawdzany po starcie serwera')
+        parser.add_argument('--timeout', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat musi być >= 1.')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'app.settings')}
+
+        self.stdout.write(f"{'sekwencja':<12}{'przygotowanie s':>18}{'serwer s':>12}{'razem s':>12}")
+        for name in options['sequence'] or SEQUENCES:
+            runs = [self.measure(name, env, options) for _ in range(options['repeat'])]
+            setup, server = (statistics.median(values) for values in zip(*runs))
+            self.stdout.write(f'{name:<12}{setup:>18.2f}{server:>12.2f}{setup + server:>12.2f}')
+
+    def measure(self, name, env, options):
+        commands, gunicorn_args = SEQUENCES[name]
+        started = time.perf_counter()
+        for command in commands:
+            result = subprocess.run(
+                [sys.executable, MANAGE, *command], env=env, cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+            )
+            if result.returncode:
+                raise CommandError(f"{' '.join(command)}: {result.stderr.strip()}")
+        setup = time.perf_counter() - started
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app.wsgi:application', '--bind', f'127.0.0.1:{port}',
+             *(argument.format(workers=options['workers']) for argument in gunicorn_args)],
+            env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            ready = wait_for_http(f"http://127.0.0.1:{port}{options['path']}", server, options['timeout'])
+        finally:
+            server.terminate()
+            server.wait()
+        return setup, ready
@@ -0,0 +1,102 @@
+import re
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from core.dataset import seed_posts, seed_users
+from core.models import Comment, Post
+from core.search import search_posts
+
+User = get_user_model()
+
+FULL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (core_post|core_comment)\b'),
+    'sqlite': re.compile(r'\bSCAN (core_post|core_comment)\b(?! USING)'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Generuje syntetyczne dane i raportuje plany EXPLAIN oraz czasy zapytań filtrów API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Liczba postów do wygenerowania przed pomiarem')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--comments-per-post', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5, help='Liczba powtórzeń każdego zapytania')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--strict', action='store_true',
+                            help='Zakończ błędem, jeśli któreś zapytanie robi pełny skan tabeli')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            users = seed_users(options['users'])
+            self.stdout.write(f"Generuję {options['seed']} postów...")
+            seed_posts(
+                options['seed'], users, comments_per_post=options['comments_per_post'],
+                progress=lambda done, total: self.stdout.write(f'  {done}/{total}'),
+            )
+
+        self.stdout.write(
+            f'Posty: {Post.objects.count()}, komentarze: {Comment.objects.count()}, '
+            f'baza: {connection.vendor}'
+        )
+
+        full_scans = []
+        for name, queryset in self.get_queries(options['page_size']):
+            plan = self.explain(queryset)
+            timings = self.time(queryset, options['repeat'])
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {name} =='))
+            self.stdout.write(plan)
+            self.stdout.write(
+                f'mediana: {statistics.median(timings):.2f} ms, max: {max(timings):.2f} ms'
+            )
+            pattern = FULL_SCAN.get(connection.vendor)
+            if pattern and pattern.search(plan):
+                full_scans.append(name)
+                self.stdout.write(self.style.WARNING('Pełny skan tabeli!'))
+
+        if full_scans and options['strict']:
+            raise CommandError(f"Pełny skan tabeli w: {', '.join(full_scans)}")
+        self.stdout.write(self.style.SUCCESS('\nGotowe.'))
+
+    def get_queries(self, page_size):
+        posts = Post.objects.order_by('-created_at', 'id')
+        sample = posts.only('id', 'created_at', 'przypisany_uzytkownik').first()
+        if sample is None:
+            raise CommandError('Brak postów - uruchom z opcją --seed.')
+        author_id = Comment.objects.values_list('author_id', flat=True).first()
+        after_sample = Q(created_at__lt=sample.created_at) | Q(created_at=sample.created_at, id__gt=sample.id)
+        comments = Comment.objects.order_by('created_at', 'id')
+
+        return [
+            ('GET /api/posts/', posts[:page_size + 1]),
+            ('GET /api/posts/ (kolejna strona)', posts.filter(after_sample)[:page_size + 1]),
+            ('GET /api/posts/?status=Aktywny', posts.filter(status='Aktywny')[:page_size + 1]),
+            ('GET /api/posts/?przypisany_uzytkownik=<id>',
+             posts.filter(przypisany_uzytkownik_id=sample.przypisany_uzytkownik_id)[:page_size + 1]),
+            ('GET /api/posts/?status=Nowy&przypisany_uzytkownik=<id>',
+             posts.filter(status='Nowy', przypisany_uzytkownik_id=sample.przypisany_uzytkownik_id)[:page_size + 1]),
+            ('GET /api/posts/?search=serwer',
+             search_posts(posts, 'serwer').order_by('-search_rank', '-created_at', 'id')[:page_size + 1]),
+            ('GET /api/posts/{id}/', Post.objects.filter(pk=sample.pk)),
+            ('GET /api/comments/?post=<id>', comments.filter(post_id=sample.pk)[:page_size + 1]),
+            ('GET /api/comments/?author=<id>', comments.filter(author_id=author_id)[:page_size + 1]),
+            ('GET /posts/{id}/history/', Post.history.filter(id=sample.pk)),
+        ]
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    def time(self, queryset, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.export import DEFAULT_CHUNK_SIZE, EXPORTS, FORMATS, export_rows, parse_since, render
+
+
+class Command(BaseCommand):
+    help = 'Eksportuje posty, komentarze lub historię postów strumieniowo do CSV lub NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--since', help='Tylko rekordy zmienione po tej dacie (ISO 8601)')
+        parser.add_argument('--output', help='Plik wynikowy (domyślnie standardowe wyjście)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--database', help='Alias bazy do odczytu, np. replica (domyślnie default)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError:
+                raise CommandError('Niepoprawna data w --since.')
+
+        if options['database'] and options['database'] not in connections.settings:
+            raise CommandError(f"Nieznany alias bazy: {options['database']}")
+        rows = export_rows(
+            options['kind'], since=since, chunk_size=options['chunk_size'], using=options['database'],
+        )
+        chunks = render(options['kind'], options['format'], rows)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Zapisano eksport do {options['output']}"))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
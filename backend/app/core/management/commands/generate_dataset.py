@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.dataset import SYNTHETIC_PREFIX, seed_posts, seed_users
+from core.models import Comment, Post
+from core.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Generuje syntetyczny zbiór danych do testów wydajności: użytkowników, posty, komentarze '
+        'i historię zmian, wstawiane przez bulk_create w partiach. Dane są dopisywane do istniejących; '
+        f'użytkownicy mają nazwy {SYNTHETIC_PREFIX}_<n> i wspólne hasło z --password.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--comments-per-post', type=int, default=3, help='Średnia liczba komentarzy')
+        parser.add_argument('--updates-per-post', type=int, default=2,
+                            help='Średnia liczba zmian statusu w historii; 0 = bez historii')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=730, help='Zakres dat wstecz')
+        parser.add_argument('--password', default='benchmark', help='Hasło nowych użytkowników syntetycznych')
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['posts'] < 0 or options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--posts musi być >= 0, a --users i --batch-size >= 1.')
+        rng = random.Random(options['random_seed'])
+        started = time.perf_counter()
+
+        users = seed_users(options['users'], rng=rng, password=options['password'])
+        self.stdout.write(f'Użytkownicy: {len(users)}')
+
+        step = max(options['posts'] // 20, options['batch_size'])
+
+        def progress(done, total):
+            if done % step < options['batch_size'] or done == total:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  {done}/{total} postów ({done / elapsed:.0f}/s)')
+
+        comments = seed_posts(
+            options['posts'], users,
+            comments_per_post=options['comments_per_post'],
+            updates_per_post=options['updates_per_post'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            rng=rng,
+            progress=progress,
+        )
+        # bulk_create skips the signals that invalidate cached responses.
+        bump_version(Post)
+        bump_version(Comment)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dodano {options['posts']} postów i {comments} komentarzy w "
+            f'{time.perf_counter() - started:.1f}s. W bazie: {Post.objects.count()} postów, '
+            f'{Comment.objects.count()} komentarzy, {Post.history.count()} wpisów historii postów.'
+        ))
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.images import ImageVariantError, ensure_variants
+from core.models import Post
+
+
+def _setup_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _process(name, force):
+    try:
+        ensure_variants(name, force=force)
+    except ImageVariantError as exc:
+        return name, str(exc)
+    return name, None
+
+
+class Command(BaseCommand):
+    help = 'Generuje miniatury i wersje średnie dla istniejących obrazów postów'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Liczba procesów (domyślnie liczba rdzeni)')
+        parser.add_argument('--force', action='store_true', help='Generuj ponownie istniejące warianty')
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        if not names:
+            self.stdout.write('Brak obrazów do przetworzenia.')
+            return
+
+        # Workers only touch storage; do not hand them the parent's connections.
+        connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=_setup_worker) as pool:
+            results = pool.map(_process, names, [options['force']] * len(names), chunksize=8)
+            for index, (name, error) in enumerate(results, 1):
+                if error:
+                    failed += 1
+                    self.stderr.write(self.style.WARNING(f'Pominięto {error}'))
+                if index % 100 == 0:
+                    self.stdout.write(f'{index}/{len(names)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Przetworzono {len(names) - failed} obrazów, błędy: {failed}.'
+        ))
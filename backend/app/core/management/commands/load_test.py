@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+
+DEFAULT_PATHS = [
+    '/api/posts/?count=0',
+    '/api/posts/{post}/',
+    '/api/posts/{post}/comments/',
+    '/api/users/me/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Test obciążeniowy endpointów odczytu: porównuje req/s i p50/p95/p99 między '
+        'uruchomionymi serwerami, np. --target wsgi=http://localhost:8002 '
+        '--target asgi=http://localhost:8003. Oba serwery powinny używać tej samej bazy; '
+        'aby mierzyć same widoki, uruchom je z API_RESPONSE_CACHE_ENABLED=0.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', default=[], metavar='NAZWA=URL')
+        parser.add_argument('--path', action='append', default=[],
+                            help='Ścieżka do odpytywania; {post} zastępowane id pierwszego posta')
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--password', default='admin')
+        parser.add_argument('--token', help='Gotowy token zamiast logowania')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0, help='Czas pomiaru w sekundach')
+        parser.add_argument('--warmup', type=float, default=1.0)
+        parser.add_argument('--output', help='Zapisz wyniki jako JSON')
+
+    def handle(self, *args, **options):
+        targets = []
+        for value in options['target'] or ['wsgi=http://localhost:8002']:
+            name, sep, url = value.partition('=')
+            if not sep or not url.startswith(('http://', 'https://')):
+                raise CommandError(f'Niepoprawny --target: {value} (oczekiwano NAZWA=URL).')
+            targets.append((name, url.rstrip('/')))
+
+        results = {}
+        for name, base in targets:
+            try:
+                token = options['token'] or loadtest.login(base, options['username'], options['password'])
+            except (OSError, RuntimeError) as exc:
+                raise CommandError(f'{name}: {exc}')
+            headers = {'Authorization': f'Token {token}', 'Accept': 'application/json'}
+            paths = self.resolve_paths(base, options['path'] or DEFAULT_PATHS, headers)
+
+            self.stdout.write(f'{name}: {base} ({options["concurrency"]} połączeń, {options["duration"]}s)')
+            results[name] = loadtest.run(
+                base, paths, headers,
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+            )
+
+        self.stdout.write(f"{'cel':<10}{'żądania':>10}{'błędy':>8}{'req/s':>10}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<10}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10}"
+                f"{result['p50_ms']!s:>10}{result['p95_ms']!s:>10}{result['p99_ms']!s:>10}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+                output.write('\n')
+
+    def resolve_paths(self, base, paths, headers):
+        if not any('{post}' in path for path in paths):
+            return paths
+        page = loadtest.get_json(base, '/api/posts/?page_size=1&count=0', headers) or {}
+        results = page.get('results') or []
+        if not results:
+            raise CommandError(f'{base}: brak postów, najpierw uruchom explain_queries --seed.')
+        return [path.replace('{post}', str(results[0]['id'])) for path in paths]
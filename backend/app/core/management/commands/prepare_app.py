@@ -0,0 +1,58 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import OperationalError
+
+from .wait_for_db import wait_for_database
+
+
+def pending_migrations(using='default'):
+    """Migrations not yet applied to `using`, in the order `migrate` would apply them."""
+    executor = MigrationExecutor(connections[using])
+    targets = executor.loader.graph.leaf_nodes()
+    return [migration for migration, backwards in executor.migration_plan(targets) if not backwards]
+
+
+class Command(BaseCommand):
+    help = (
+        'Przygotowuje bazę przed startem serwera w jednym procesie: wait_for_db, migrate (tylko gdy są '
+        'niezastosowane migracje) i init_data. Wypisuje czas każdego kroku.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Maksymalny czas oczekiwania na bazę')
+        parser.add_argument('--skip-init-data', action='store_true')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        started = time.perf_counter()
+
+        try:
+            waited = wait_for_database(using, timeout=options['timeout'])
+        except OperationalError as exc:
+            raise CommandError(f"Baza danych niedostępna po {options['timeout']:.0f}s: {exc}")
+        self.stdout.write(f'Baza dostępna po {waited:.2f}s')
+
+        step = time.perf_counter()
+        pending = pending_migrations(using)
+        if pending:
+            self.stdout.write(f'Niezastosowane migracje: {len(pending)}')
+            call_command('migrate', database=using, interactive=False, verbosity=1, stdout=self.stdout)
+        else:
+            self.stdout.write('Brak nowych migracji - pomijam migrate.')
+        self.stdout.write(f'Migracje: {time.perf_counter() - step:.2f}s')
+
+        if not options['skip_init_data']:
+            step = time.perf_counter()
+            try:
+                call_command('init_data', stdout=self.stdout)
+            except Exception as exc:
+                # As with `migrate && init_data; gunicorn`: seed data must not block the server.
+                self.stderr.write(self.style.WARNING(f'init_data nie powiodło się: {exc}'))
+            self.stdout.write(f'Dane startowe: {time.perf_counter() - step:.2f}s')
+
+        self.stdout.write(self.style.SUCCESS(f'Gotowe w {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Comment, Post
+from core.retention import prune_history, retention_policy
+
+HISTORY_MODELS = {
+    'posts': Post.history.model,
+    'comments': Comment.history.model,
+}
+
+
+class Command(BaseCommand):
+    help = 'Kompaktuje i archiwizuje historię zmian postów i komentarzy zgodnie z HISTORY_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='*',
+                            help='Które historie przetworzyć: posts, comments (domyślnie wszystkie)')
+        parser.add_argument('--keep-days', type=int, help='Usuń wpisy starsze niż tyle dni (0 = bez limitu)')
+        parser.add_argument('--collapse-minutes', type=int,
+                            help='Scal kolejne zmiany tego samego użytkownika w tym oknie (0 = wyłączone)')
+        parser.add_argument('--archive-dir', help='Katalog archiwum .ndjson.gz')
+        parser.add_argument('--no-archive', action='store_true', help='Usuń wpisy bez archiwizacji')
+        parser.add_argument('--batch-size', type=int, help='Liczba obiektów przetwarzanych w jednej transakcji')
+        parser.add_argument('--sleep', type=float, help='Przerwa między partiami w sekundach')
+        parser.add_argument('--dry-run', action='store_true', help='Tylko policz, nic nie usuwaj')
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or sorted(HISTORY_MODELS)
+        unknown = set(kinds) - set(HISTORY_MODELS)
+        if unknown:
+            raise CommandError(f"Nieznana historia: {', '.join(sorted(unknown))}.")
+
+        policy = retention_policy(
+            KEEP_DAYS=options['keep_days'],
+            COLLAPSE_SAME_USER_MINUTES=options['collapse_minutes'],
+            ARCHIVE_DIR='' if options['no_archive'] else options['archive_dir'],
+            BATCH_SIZE=options['batch_size'],
+            SLEEP=options['sleep'],
+        )
+
+        for kind in kinds:
+            stats = prune_history(HISTORY_MODELS[kind], policy, dry_run=options['dry_run'])
+            verb = 'Do usunięcia' if options['dry_run'] else 'Usunięto'
+            self.stdout.write(
+                f'{kind}: {verb} {stats.removed} wpisów z {stats.objects} obiektów '
+                f'(bez zmian: {stats.noop}, scalone: {stats.collapsed}, przeterminowane: {stats.expired})'
+            )
+            if stats.archive:
+                self.stdout.write(f'{kind}: archiwum {stats.archive}')
+        self.stdout.write(self.style.SUCCESS('Gotowe.'))
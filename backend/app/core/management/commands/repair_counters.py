@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import repair_counters
+from core.models import Comment, Post
+from core.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = 'Przelicza liczniki komentarzy postów (comment_count, last_comment_at) i naprawia rozbieżne'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Tylko policz rozbieżne posty')
+
+    def handle(self, *args, **options):
+        drifted = repair_counters(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=lambda last_id, drifted: self.stdout.write(f'  do id {last_id}: {drifted} rozbieżnych')
+            if options['verbosity'] > 1 else None,
+        )
+        if options['dry_run']:
+            self.stdout.write(f'Rozbieżne liczniki: {drifted} postów (bez zmian).')
+            return
+        if drifted:
+            bump_version(Post)
+            bump_version(Comment)
+        self.stdout.write(self.style.SUCCESS(f'Naprawiono liczniki {drifted} postów.'))
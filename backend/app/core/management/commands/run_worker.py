@@ -0,0 +1,80 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import jobs
+
+
+def _run_threads(stop, threads, burst, poll_interval):
+    """Run `threads` worker loops in this process; returns the number of jobs run."""
+    processed = []
+
+    def loop():
+        processed.append(jobs.work(stop, burst=burst, poll_interval=poll_interval))
+
+    pool = [threading.Thread(target=loop, name=f'job-worker-{i}') for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(processed)
+
+
+def _child(stop, threads, burst, poll_interval):
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _run_threads(stop, threads, burst, poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        'Uruchamia worker kolejki zadań w tle (core.jobs): --processes procesów po --threads wątków. '
+        'Zadania pobierane są przez SELECT ... FOR UPDATE SKIP LOCKED, więc można uruchomić wiele workerów. '
+        'SIGTERM/SIGINT kończy pracę po bieżących zadaniach.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=4, help='Wątków na proces')
+        parser.add_argument('--poll-interval', type=float, help='Sekundy między sprawdzeniami pustej kolejki')
+        parser.add_argument('--burst', action='store_true', help='Zakończ, gdy nie ma zadań do wykonania')
+
+    def handle(self, *args, **options):
+        processes, threads = options['processes'], options['threads']
+        if processes < 1 or threads < 1:
+            raise CommandError('--processes i --threads muszą być >= 1.')
+        if processes == 1:
+            stop = threading.Event()
+            self.handle_signals(stop)
+            self.stdout.write(f'Worker: {threads} wątków, zadania: {", ".join(sorted(jobs.HANDLERS))}')
+            processed = _run_threads(stop, threads, options['burst'], options['poll_interval'])
+            self.stdout.write(f'Wykonano zadań: {processed}')
+            return
+
+        stop = multiprocessing.Event()
+        self.handle_signals(stop)
+        connections.close_all()
+        children = [
+            multiprocessing.Process(target=_child, args=(stop, threads, options['burst'], options['poll_interval']))
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        self.stdout.write(f'Worker: {processes} procesów po {threads} wątków')
+        for child in children:
+            child.join()
+
+    def handle_signals(self, stop):
+        def shutdown(signum, frame):
+            self.stdout.write('Kończę po bieżących zadaniach...')
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
@@ -1,21 +1,51 @@
-from django.core.management.base import BaseCommand
-from django.db.utils import OperationalError
-from psycopg2 import OperationalError as psycopg2OpError
 import time
 
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import OperationalError
+
+
+def wait_for_database(using='default', timeout=60.0, initial_delay=0.1, max_delay=2.0, on_retry=None):
+    """
+    Connect to `using`, retrying with exponential backoff (initial_delay,
+    doubled up to max_delay) until it answers or `timeout` seconds pass.
+    Returns the seconds waited; raises OperationalError on timeout.
+    """
+    connection = connections[using]
+    started = time.monotonic()
+    delay = initial_delay
+    while True:
+        try:
+            connection.ensure_connection()
+            return time.monotonic() - started
+        except OperationalError:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise
+            if on_retry:
+                on_retry(min(delay, remaining))
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
 
 class Command(BaseCommand):
+    help = 'Czeka, aż baza danych zacznie przyjmować połączenia (ponawia z rosnącym odstępem, do --timeout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Maksymalny czas oczekiwania w sekundach')
+        parser.add_argument('--max-delay', type=float, default=2.0, help='Najdłuższa przerwa między próbami')
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while not db_up:
-            try:
-                from django.db import connection
-                connection.ensure_connection()
-                db_up = True
-            except (psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
-        time.sleep(1)
+
+        def retry(delay):
+            self.stdout.write(f'Database unavailable, retrying in {delay:.1f}s...')
+
+        try:
+            waited = wait_for_database(
+                options['database'], timeout=options['timeout'], max_delay=options['max_delay'], on_retry=retry,
+            )
+        except OperationalError as exc:
+            raise CommandError(f"Baza danych niedostępna po {options['timeout']:.0f}s: {exc}")
+        self.stdout.write(self.style.SUCCESS(f'Database available! ({waited:.2f}s)'))
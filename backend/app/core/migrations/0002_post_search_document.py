@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:50
+
+import html
+import re
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# Frozen copies of core.search as of this migration, so later changes there
+# cannot change what this migration writes.
+SEARCH_CONFIG = 'tickets_pl'
+SEARCH_INDEX_NAME = 'core_post_search_gin'
+
+_whitespace = re.compile(r'\s+')
+
+
+def html_to_text(value):
+    return _whitespace.sub(' ', html.unescape(strip_tags(value or ''))).strip()
+
+
+def build_search_document(nazwa, opis, comments=()):
+    parts = [nazwa, html_to_text(opis)]
+    parts.extend(html_to_text(content) for content in comments)
+    return '\n'.join(part for part in parts if part)
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('search_document', config=SEARCH_CONFIG)
+
+
+def fill_search_documents(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    Comment = apps.get_model('core', 'Comment')
+    db = schema_editor.connection.alias
+
+    batch = []
+    for post in Post.objects.using(db).only('nazwa', 'opis').iterator(chunk_size=500):
+        comments = Comment.objects.using(db).filter(post_id=post.pk).values_list('content', flat=True)
+        post.search_document = build_search_document(post.nazwa, post.opis, comments)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.using(db).bulk_update(batch, ['search_document'])
+            batch = []
+    Post.objects.using(db).bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.indexes import GinIndex
+
+    schema_editor.execute(f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+                IF EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'polish') THEN
+                    CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = polish);
+                ELSE
+                    CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = simple);
+                END IF;
+            END IF;
+        END $$;
+    """)
+    Post = apps.get_model('core', 'Post')
+    schema_editor.add_index(Post, GinIndex(search_vector(), name=SEARCH_INDEX_NAME))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}')
+    schema_editor.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {SEARCH_CONFIG}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
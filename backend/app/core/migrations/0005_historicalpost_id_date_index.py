@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX historicalpost_id_date_idx '
+            'ON core_historicalpost (id, history_date DESC, history_id DESC)',
+            'DROP INDEX historicalpost_id_date_idx',
+        ),
+    ]
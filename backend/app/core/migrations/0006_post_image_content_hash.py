@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:08
+
+import core.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_historicalpost_id_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=core.images.post_image_path),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    from core.counters import counter_values
+
+    Post = apps.get_model('core', 'Post')
+    Comment = apps.get_model('core', 'Comment')
+    Post.objects.using(schema_editor.connection.alias).update(**counter_values(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_post_image_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_comment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from simple_history import register
 from simple_history.models import HistoricalRecords
+from .images import post_image_path
+from .search import build_search_document
 
 
 class Post(models.Model):
@@ -14,20 +17,72 @@ class Post(models.Model):
     opis = models.TextField(blank=True, null=True)
     status = models.CharField(choices=status_choices, default="Nowy")
     przypisany_uzytkownik = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    image = models.ImageField(upload_to='post_images/', null=True, blank=True)
+    image = models.ImageField(upload_to=post_image_path, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # Maintained by core.counters from Comment signals; repair with repair_counters.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
 
-    history = HistoricalRecords()
+    counter_fields = ('comment_count', 'last_comment_at')
+
+    history = HistoricalRecords(excluded_fields=['search_document', *counter_fields])
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Ticket"
         verbose_name_plural = "Tickety"
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='post_created_idx'),
+            models.Index(fields=['status', '-created_at', 'id'], name='post_status_created_idx'),
+            models.Index(
+                fields=['przypisany_uzytkownik', '-created_at', 'id'], name='post_assignee_created_idx'
+            ),
+            models.Index(fields=['updated_at', 'id'], name='post_updated_idx'),
+        ]
 
     def __str__(self):
         return self.nazwa
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_text = instance._text_fields()
+        return instance
+
+    def _text_fields(self):
+        deferred = self.get_deferred_fields()
+        return tuple(getattr(self, name) if name not in deferred else None for name in ('nazwa', 'opis'))
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            rebuild = self._state.adding or getattr(self, '_loaded_text', None) != self._text_fields()
+        else:
+            rebuild = bool({'nazwa', 'opis'} & set(update_fields))
+        if rebuild:
+            comments = self.comments.values_list('content', flat=True) if self.pk else ()
+            self.search_document = build_search_document(self.nazwa, self.opis, comments)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            # Never write back counters read before a concurrent comment changed
+            # them, nor a search document the refresh job may have rewritten.
+            skipped = {*self.counter_fields, *(() if rebuild else ('search_document',))}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_text = self._text_fields()
+
+    def refresh_search_document(self):
+        self.search_document = build_search_document(
+            self.nazwa, self.opis, self.comments.values_list('content', flat=True)
+        )
+        Post.objects.filter(pk=self.pk).update(search_document=self.search_document)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
@@ -40,6 +95,51 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='comment_author_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='comment_updated_idx'),
+        ]
 
     def __str__(self):
-        return f"Komentarz {self.author} do {self.post.nazwa[:30]}"
\ No newline at end of file
+        return f"Komentarz {self.author} do {self.post.nazwa[:30]}"
+
+
+class Job(models.Model):
+    """A unit of background work run by `manage.py run_worker` (see core.jobs)."""
+
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    status_choices = [(QUEUED, QUEUED), (RUNNING, RUNNING), (DONE, DONE), (FAILED, FAILED)]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=status_choices, default=QUEUED)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'id'], name='job_status_run_idx'),
+        ]
+        constraints = [
+            # At most one pending job per key; a running one may still read stale data.
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=models.Q(status='queued'), name='job_queued_dedupe_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+# API responses embed usernames and e-mails, so user changes must move the
+# ETags built from history tables (posts.conditional). Credentials and login
+# bookkeeping are not recorded.
+register(User, app='core', excluded_fields=['password', 'last_login'])
@@ -0,0 +1,151 @@
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+HISTORY_META_FIELDS = {
+    'history_id', 'history_date', 'history_change_reason', 'history_type', 'history_user',
+}
+DIFF_IGNORED_FIELDS = {'updated_at'}
+
+
+def retention_policy(**overrides):
+    policy = {
+        'KEEP_DAYS': 365,
+        'COLLAPSE_NOOP': True,
+        'COLLAPSE_SAME_USER_MINUTES': 10,
+        'ARCHIVE_DIR': os.path.join(settings.BASE_DIR, 'history_archive'),
+        'BATCH_SIZE': 500,
+        'SLEEP': 0,
+    }
+    policy.update(getattr(settings, 'HISTORY_RETENTION', {}))
+    policy.update({key: value for key, value in overrides.items() if value is not None})
+    return policy
+
+
+@dataclass
+class PruneStats:
+    objects: int = 0
+    noop: int = 0
+    collapsed: int = 0
+    expired: int = 0
+    archive: str = None
+
+    @property
+    def removed(self):
+        return self.noop + self.collapsed + self.expired
+
+
+def tracked_fields(history_model):
+    return [
+        f.attname for f in history_model._meta.concrete_fields
+        if f.name not in HISTORY_META_FIELDS and f.name not in DIFF_IGNORED_FIELDS
+    ]
+
+
+def select_removals(records, fields, cutoff, policy):
+    """
+    Decide which history rows of one object can go. `records` are ordered
+    oldest first. Returns {history_id: reason}.
+
+    - collapsed: an update superseded by the same user's next update within
+      the collapse window,
+    - noop: an update identical to the last kept record,
+    - expired: older than `cutoff`, except the newest such row, which stays
+      as the baseline the later records apply to.
+    """
+    removals = {}
+    window = policy['COLLAPSE_SAME_USER_MINUTES']
+    kept = []
+    for record in records:
+        if record['history_type'] == '~' and kept:
+            previous = kept[-1]
+            if window and previous['history_type'] == '~' \
+                    and previous['history_user_id'] == record['history_user_id'] \
+                    and record['history_date'] - previous['history_date'] <= timedelta(minutes=window):
+                removals[kept.pop()['history_id']] = 'collapsed'
+            if policy['COLLAPSE_NOOP'] and kept and all(record[f] == kept[-1][f] for f in fields):
+                removals[record['history_id']] = 'noop'
+                continue
+        kept.append(record)
+
+    if cutoff is not None:
+        alive = [r for r in records if r['history_id'] not in removals]
+        expired = [r for r in alive if r['history_date'] < cutoff]
+        for record in expired[:-1]:
+            removals[record['history_id']] = 'expired'
+    return removals
+
+
+def prune_history(history_model, policy, dry_run=False, progress=None):
+    """
+    Walk `history_model` in chunks of BATCH_SIZE objects, archive the rows
+    chosen by `select_removals` to a gzipped NDJSON file and delete them.
+    Each chunk is its own transaction so the job can run next to live traffic.
+    """
+    stats = PruneStats()
+    manager = history_model._default_manager
+    fields = tracked_fields(history_model)
+    columns = [f.attname for f in history_model._meta.concrete_fields]
+    keep_days = policy['KEEP_DAYS']
+    cutoff = timezone.now() - timedelta(days=keep_days) if keep_days else None
+
+    archive = None
+    archive_path = None
+    if policy['ARCHIVE_DIR']:
+        archive_path = os.path.join(
+            policy['ARCHIVE_DIR'],
+            f"{history_model._meta.db_table}-{timezone.now():%Y%m%d%H%M%S}.ndjson.gz",
+        )
+
+    last_id = None
+    try:
+        while True:
+            ids = manager.order_by('id')
+            if last_id is not None:
+                ids = ids.filter(id__gt=last_id)
+            ids = list(ids.values_list('id', flat=True).distinct()[:policy['BATCH_SIZE']])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            records = {}
+            for record in manager.filter(id__in=ids).order_by('id', 'history_date', 'history_id').values(*columns):
+                records.setdefault(record['id'], []).append(record)
+
+            removals = {}
+            for object_records in records.values():
+                removals.update(select_removals(object_records, fields, cutoff, policy))
+            stats.objects += len(records)
+            for reason in removals.values():
+                setattr(stats, reason, getattr(stats, reason) + 1)
+
+            if removals and not dry_run:
+                with transaction.atomic():
+                    if archive_path:
+                        if archive is None:
+                            os.makedirs(policy['ARCHIVE_DIR'], exist_ok=True)
+                            archive = gzip.open(archive_path, 'at', encoding='utf-8')
+                            stats.archive = archive_path
+                        for object_records in records.values():
+                            for record in object_records:
+                                if record['history_id'] in removals:
+                                    archive.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+                        archive.flush()
+                    manager.filter(history_id__in=list(removals)).delete()
+
+            if progress:
+                progress(stats)
+            if policy['SLEEP']:
+                time.sleep(policy['SLEEP'])
+    finally:
+        if archive is not None:
+            archive.close()
+    return stats
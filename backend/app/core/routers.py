@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_alias():
+    """The configured replica alias, or None when DATABASES has no such entry."""
+    alias = getattr(settings, 'DB_REPLICA_ALIAS', 'replica')
+    return alias if alias in connections.settings else None
+
+
+def current_read_alias():
+    return _read_alias.get()
+
+
+def set_read_alias(alias):
+    """Route reads in the current context to `alias` (None: default); returns the previous alias."""
+    previous = _read_alias.get()
+    _read_alias.set(alias)
+    return previous
+
+
+@contextmanager
+def read_from(alias):
+    previous = set_read_alias(alias)
+    try:
+        yield alias
+    finally:
+        set_read_alias(previous)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the alias selected for the current context (see
+    `read_from` and `posts.replicas.ReplicaReadMixin`) and every write to
+    the primary. Outside such a context Django's defaults apply: `default`,
+    or the database an instance was loaded from for its related objects.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
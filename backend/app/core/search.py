@@ -0,0 +1,64 @@
+import html
+import re
+
+from django.db import connections
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
+from django.utils.html import strip_tags
+
+SEARCH_CONFIG = 'tickets_pl'
+SEARCH_INDEX_NAME = 'core_post_search_gin'
+
+_whitespace = re.compile(r'\s+')
+_term = re.compile(r'\w+', re.UNICODE)
+
+
+def html_to_text(value):
+    return _whitespace.sub(' ', html.unescape(strip_tags(value or ''))).strip()
+
+
+def build_search_document(nazwa, opis, comments=()):
+    parts = [nazwa, html_to_text(opis)]
+    parts.extend(html_to_text(content) for content in comments)
+    return '\n'.join(part for part in parts if part)
+
+
+def search_terms(query):
+    return _term.findall(query or '')
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('search_document', config=SEARCH_CONFIG)
+
+
+def search_posts(queryset, query):
+    """
+    Filter `queryset` to posts matching every term of `query` and annotate
+    them with `search_rank`. PostgreSQL uses the GIN-indexed tsvector with
+    prefix matching; other backends fall back to `icontains` on the stored
+    plain-text document, ranking title hits first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    if connections[queryset.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        raw = ' & '.join(f'{term}:*' for term in terms)
+        search_query = SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+        vector = search_vector()
+        return queryset.alias(search=vector).filter(search=search_query).annotate(
+            search_rank=SearchRank(vector, search_query, cover_density=True),
+        )
+
+    condition = Q()
+    title_hits = Value(0)
+    for term in terms:
+        condition &= Q(search_document__icontains=term)
+        title_hits = title_hits + Case(
+            When(nazwa__icontains=term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    return queryset.filter(condition).annotate(search_rank=Cast(title_hits, FloatField()))
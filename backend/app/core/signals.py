@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, jobs
+from .models import Comment, Post
+
+
+def deleted_with_post(origin):
+    """True when a comment is removed by a cascade from deleting its post(s)."""
+    return isinstance(origin, Post) or getattr(origin, 'model', None) is Post
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_post_search_document(sender, instance, origin=None, **kwargs):
+    if deleted_with_post(origin):
+        return
+    jobs.enqueue('search.refresh_post', {'post_id': instance.post_id}, dedupe_key=f'search:{instance.post_id}')
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_post(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_post_id = (
+            Comment.objects.filter(pk=instance.pk).values_list('post_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.comment_added(instance.post_id, instance.created_at)
+        return
+    previous = getattr(instance, '_previous_post_id', None)
+    if previous is not None and previous != instance.post_id:
+        counters.recount([previous, instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with_post(origin):
+        counters.comment_removed(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def generate_image_variants(sender, instance, update_fields=None, **kwargs):
+    if not getattr(settings, 'IMAGE_VARIANTS_ON_UPLOAD', True) or not instance.image:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    name = instance.image.name
+    jobs.enqueue('images.generate_variants', {'name': name}, dedupe_key=f'variants:{name}')
@@ -0,0 +1,22 @@
+from .images import ImageVariantError, ensure_variants
+from .jobs import register
+from .models import Post
+from .versions import bump_version
+
+
+@register('images.generate_variants')
+def generate_image_variants(name):
+    try:
+        ensure_variants(name)
+    except ImageVariantError:
+        # Unreadable upload: retrying will not help, the lazy path answers 404.
+        pass
+
+
+@register('search.refresh_post')
+def refresh_search_document(post_id):
+    post = Post.objects.filter(pk=post_id).only('nazwa', 'opis').first()
+    if post is not None:
+        post.refresh_search_document()
+        # The update bypasses signals; drop cached search results explicitly.
+        bump_version(Post)
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import Signal
+
+VERSION_KEY = 'api:version:{}'
+
+# Sent with `model` after its version counter moved (`posts.cache` counts these).
+version_bumped = Signal()
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def _fresh_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(models):
+    """Current version counter of each of `models`, in the same order."""
+    cache = get_cache()
+    keys = [VERSION_KEY.format(model_label(model)) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in versions}
+    for key, value in missing.items():
+        if not cache.add(key, value, timeout=None):
+            value = cache.get(key, value)
+        versions[key] = value
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """Invalidate everything cached under the version of `model`."""
+    cache = get_cache()
+    key = VERSION_KEY.format(model_label(model))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+    version_bumped.send(sender=bump_version, model=model)
+
+
+def invalidate(model):
+    """
+    `bump_version` now and again once the current transaction commits: a
+    reader in between may cache the pre-commit rows under the first bump.
+    """
+    bump_version(model)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_version(model))
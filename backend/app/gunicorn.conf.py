@@ -0,0 +1,21 @@
+"""
+Gunicorn settings for app.wsgi / app.asgi (`gunicorn -c gunicorn.conf.py ...`).
+
+With preload_app (the default, GUNICORN_PRELOAD=0 to disable) Django and
+the URLconf are imported once in the master and the workers are forked
+from it, so they share that memory and start answering immediately
+instead of each importing the project on its own.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+
+def pre_fork(server, worker):
+    # Workers must never inherit a database socket opened in the master.
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
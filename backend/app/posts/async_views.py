@@ -0,0 +1,129 @@
+import inspect
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+
+def async_views_enabled():
+    return getattr(settings, 'API_ASYNC_VIEWS', False)
+
+
+async def aiterate(iterable, batch_size=100):
+    """
+    Async iterator over a sync `iterable`, pulled `batch_size` items at a
+    time in the request's sync thread. Under ASGI a StreamingHttpResponse
+    buffers a sync iterator into a list before sending anything; this keeps
+    a streamed export to one batch in memory. The iterable is closed when
+    the client goes away.
+    """
+    iterator = iter(iterable)
+
+    def next_batch():
+        return list(islice(iterator, batch_size))
+
+    try:
+        while batch := await sync_to_async(next_batch)():
+            for item in batch:
+                yield item
+    finally:
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
+
+
+class AsyncReadMixin:
+    """
+    Serve `async_actions` as native async views when API_ASYNC_VIEWS is on
+    (set by `app/asgi.py`).
+
+    The request still goes through DRF's authentication, permission and
+    throttling checks, run in a worker thread, but the page and the object
+    lookups use the async ORM, so a slow query no longer pins a thread.
+    Writes keep using the regular sync handlers. Under WSGI the viewset is
+    left as it is.
+    """
+    async_actions = ('list', 'retrieve')
+    async_mode = False
+    async_request = False
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        if async_views_enabled() and set((actions or {}).values()) & set(cls.async_actions):
+            initkwargs['async_mode'] = True
+            view = super().as_view(actions, **initkwargs)
+
+            async def async_view(request, *args, **kwargs):
+                return await view(request, *args, **kwargs)
+
+            async_view.__dict__.update(view.__dict__)
+            async_view.__name__ = view.__name__
+            return async_view
+        return super().as_view(actions, **initkwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.async_mode:
+            return self.adispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """`APIView.dispatch` with the read handlers awaited on the event loop."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            method = request.method.lower()
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if method in ('get', 'head') and self.action in self.async_actions:
+                self.async_request = True
+                response = handler(request, *args, **kwargs)
+                if inspect.isawaitable(response):
+                    response = await response
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def list(self, request, *args, **kwargs):
+        if self.async_request:
+            return self.alist(request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.async_request:
+            return self.aretrieve(request, *args, **kwargs)
+        return super().retrieve(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        # Filter backends may validate against the database (django-filter).
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        if self.paginator is None:
+            serializer = self.get_serializer([obj async for obj in queryset], many=True)
+            return Response(serializer.data)
+
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        await sync_to_async(self.check_object_permissions)(request, instance)
+        return Response(self.get_serializer(instance).data)
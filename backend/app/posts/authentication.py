@@ -0,0 +1,103 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+CACHE_KEY = 'api:token:{}'
+
+
+class LocalTokenCache:
+    """Small thread-safe LRU of token -> (user, token) with a TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalTokenCache()
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    """The cross-process token cache, or None when there is no shared backend."""
+    if not getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', False):
+        return None
+    return caches[getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'default')]
+
+
+def invalidate_token(key):
+    digest = _digest(key)
+    local_cache.delete(digest)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(CACHE_KEY.format(digest))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers token -> user in-process for
+    AUTH_TOKEN_LOCAL_TTL seconds and, with AUTH_TOKEN_SHARED_CACHE (a cache
+    shared by all processes), in that cache for AUTH_TOKEN_CACHE_TTL seconds.
+    Deleting a token or saving its user drops the entry (see
+    `posts.signals`); other workers drop their in-process copy when the
+    short local TTL runs out. A per-process cache is never used for the long
+    TTL, since the other workers would not see the invalidation.
+    """
+
+    def authenticate_credentials(self, key):
+        digest = _digest(key)
+        entry = local_cache.get(digest)
+        if entry is None:
+            shared = _shared_cache()
+            entry = shared.get(CACHE_KEY.format(digest)) if shared is not None else None
+            if entry is None:
+                entry = super().authenticate_credentials(key)
+            if shared is not None:
+                shared.set(
+                    CACHE_KEY.format(digest), entry,
+                    timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300),
+                )
+            local_cache.set(digest, entry, getattr(settings, 'AUTH_TOKEN_LOCAL_TTL', 5))
+
+        user, token = entry
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return copy.copy(user), token
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from core.models import Comment, Post
+from core.search import build_search_document
+from .cache import invalidate
+from .serializers import PostBulkItemSerializer
+
+TEXT_FIELDS = {'nazwa', 'opis'}
+
+
+def validate_items(items):
+    """
+    Validate a batch without per-item queries: field validation first, then
+    one query for the referenced posts and one for the referenced users.
+    Returns (validated items, {index: errors}, {id: post}).
+    """
+    validated, errors = [], {}
+    for index, item in enumerate(items):
+        serializer = PostBulkItemSerializer(data=item, partial=isinstance(item, dict) and 'id' in item)
+        if serializer.is_valid():
+            validated.append((index, serializer.validated_data))
+        else:
+            errors[index] = serializer.errors
+
+    ids = [data['id'] for _, data in validated if 'id' in data]
+    user_ids = {
+        data['przypisany_uzytkownik_id'] for _, data in validated
+        if data.get('przypisany_uzytkownik_id') is not None
+    }
+    posts = Post.objects.in_bulk(ids)
+    existing_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+    seen = set()
+    for index, data in validated:
+        if 'id' in data:
+            if data['id'] not in posts:
+                errors.setdefault(index, {})['id'] = ['Post nie istnieje.']
+            elif data['id'] in seen:
+                errors.setdefault(index, {})['id'] = ['Post występuje w paczce więcej niż raz.']
+            seen.add(data['id'])
+        user_id = data.get('przypisany_uzytkownik_id')
+        if user_id is not None and user_id not in existing_users:
+            errors.setdefault(index, {})['przypisany_uzytkownik_id'] = ['Użytkownik nie istnieje.']
+
+    return validated, errors, posts
+
+
+@transaction.atomic
+def apply_items(validated, posts, user):
+    now = timezone.now()
+    to_create, to_update, fields = [], [], {'updated_at'}
+    results = []
+
+    for index, data in validated:
+        data = dict(data)
+        post_id = data.pop('id', None)
+        if post_id is None:
+            data.setdefault('przypisany_uzytkownik_id', user.pk)
+            post = Post(**data)
+            post.search_document = build_search_document(post.nazwa, post.opis)
+            to_create.append((index, post))
+        else:
+            post = posts[post_id]
+            for name, value in data.items():
+                setattr(post, name, value)
+            post.updated_at = now
+            fields.update(data)
+            to_update.append((index, post, bool(TEXT_FIELDS & set(data))))
+
+    if to_create:
+        bulk_create_with_history([post for _, post in to_create], Post, default_user=user)
+    if to_update:
+        retext = [post for _, post, changed in to_update if changed]
+        if retext:
+            comments = {}
+            for post_id, content in Comment.objects.filter(
+                    post__in=retext).values_list('post_id', 'content'):
+                comments.setdefault(post_id, []).append(content)
+            for post in retext:
+                post.search_document = build_search_document(
+                    post.nazwa, post.opis, comments.get(post.pk, ())
+                )
+            fields.add('search_document')
+        bulk_update_with_history(
+            [post for _, post, _ in to_update], Post, sorted(fields),
+            batch_size=500, default_user=user,
+        )
+    invalidate(Post)
+
+    results += [{'index': index, 'id': post.pk, 'result': 'created'} for index, post in to_create]
+    results += [{'index': index, 'id': post.pk, 'result': 'updated'} for index, post, _ in to_update]
+    return sorted(results, key=lambda result: result['index'])
+
+
+def max_items():
+    return getattr(settings, 'API_BULK_MAX_ITEMS', 500)
@@ -0,0 +1,138 @@
+import hashlib
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+# The version counters live in core so that core code can bump them too.
+from core.versions import (  # noqa: F401
+    VERSION_KEY, bump_version, get_cache, get_versions, invalidate, model_label, version_bumped,
+)
+
+RESPONSE_KEY = 'api:response:{}'
+
+
+class CacheStats:
+    """Worker-local hit/miss counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+
+stats = CacheStats()
+
+
+def is_enabled():
+    return getattr(settings, 'API_RESPONSE_CACHE_ENABLED', True)
+
+
+@receiver(version_bumped)
+def count_invalidation(sender, model, **kwargs):
+    stats.record('invalidations')
+
+
+class CachedResponseMixin:
+    """
+    Cache `list`/`retrieve` responses under a key built from the view, the
+    normalized query parameters and the version counters of
+    `cache_dependencies`. Writes to any of those models bump its counter
+    (see `posts.signals`), so stale entries are simply never read again and
+    age out through the cache's TTL and MAX_ENTRIES eviction.
+
+    The key also names the database the response is read from (see
+    `posts.replicas`): a lagging replica can serve rows older than the
+    current version, and a user pinned to the primary after a write must
+    not be handed that response.
+    """
+    cache_dependencies = ()
+    cached_actions = ('list', 'retrieve')
+    ignored_query_params = ('_nocache',)
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (key, tuple(sorted(values)))
+            for key, values in request.query_params.lists()
+            if key not in self.ignored_query_params
+        )
+        versions = get_versions(self.cache_dependencies)
+        raw = repr((
+            type(self).__name__,
+            self.action,
+            sorted(self.kwargs.items()),
+            params,
+            request.accepted_renderer.format,
+            getattr(self, 'read_alias', None),
+            versions,
+        ))
+        return RESPONSE_KEY.format(hashlib.sha1(raw.encode()).hexdigest())
+
+    def is_cacheable(self, request):
+        return is_enabled() and request.method == 'GET' and self.action in self.cached_actions
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return self.cache_hit(data)
+
+        stats.record('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=self.get_cache_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return await handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = await sync_to_async(self.get_response_cache_key)(request)
+        data = await cache.aget(key)
+        if data is not None:
+            return self.cache_hit(data)
+
+        stats.record('misses')
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, response.data, timeout=self.get_cache_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cache_hit(self, data):
+        stats.record('hits')
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def get_cache_timeout(self):
+        return getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 60)
+
+    def list(self, request, *args, **kwargs):
+        if getattr(self, 'async_request', False):
+            return self.acached_response(super().list, request, *args, **kwargs)
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if getattr(self, 'async_request', False):
+            return self.acached_response(super().retrieve, request, *args, **kwargs)
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,121 @@
+import hashlib
+from datetime import timezone
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+from .media import is_public, link_expiry
+
+
+def select_scalars(querysets, using='default'):
+    """Evaluate single-value querysets as scalar subqueries in one round trip."""
+    parts, params = [], []
+    for queryset in querysets:
+        sql, sql_params = queryset.query.sql_with_params()
+        parts.append(f'({sql})')
+        params.extend(sql_params)
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(parts), params)
+        return cursor.fetchone()
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETag / Last-Modified support for list and retrieve.
+
+    The validators come from the latest `history_id` and `history_date` of
+    the simple_history tables returned by `get_history_querysets()`, read
+    with a single query, so a matching `If-None-Match` or `If-Modified-Since`
+    is answered with 304 before the queryset is loaded or serialized.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def get_history_querysets(self):
+        raise NotImplementedError
+
+    def get_conditional_state(self):
+        columns = []
+        querysets = self.get_history_querysets()
+        for history in querysets:
+            columns.append(history.order_by('-history_id').values('history_id')[:1])
+            columns.append(history.order_by('-history_date').values('history_date')[:1])
+        values = select_scalars(columns, using=querysets[0].db)
+        dates = [_as_datetime(value) for value in values[1::2] if value is not None]
+        return values, max(dates, default=None)
+
+    def get_etag(self, request, state):
+        key = '|'.join([
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            # Signed media links in the body expire; see `posts.media.signed_url`.
+            '' if is_public() else str(link_expiry()),
+            *(str(value) for value in state),
+        ])
+        return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+    def is_conditional(self, request):
+        action = getattr(self, 'action', None)
+        return request.method in ('GET', 'HEAD') and action in (None, *self.conditional_actions)
+
+    def check_not_modified(self, request, state, last_modified):
+        etag = self.get_etag(request, state)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+        return etag, timestamp, not_modified
+
+    def set_validators(self, response, etag, timestamp):
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return handler(request, *args, **kwargs)
+        try:
+            state, last_modified = self.get_conditional_state()
+        except (ValueError, TypeError):
+            return handler(request, *args, **kwargs)
+
+        etag, timestamp, not_modified = self.check_not_modified(request, state, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(handler(request, *args, **kwargs), etag, timestamp)
+
+    async def aconditional_response(self, handler, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return await handler(request, *args, **kwargs)
+        try:
+            state, last_modified = await sync_to_async(self.get_conditional_state)()
+        except (ValueError, TypeError):
+            return await handler(request, *args, **kwargs)
+
+        etag, timestamp, not_modified = self.check_not_modified(request, state, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(await handler(request, *args, **kwargs), etag, timestamp)
+
+    def list(self, request, *args, **kwargs):
+        if getattr(self, 'async_request', False):
+            return self.aconditional_response(super().list, request, *args, **kwargs)
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if getattr(self, 'async_request', False):
+            return self.aconditional_response(super().retrieve, request, *args, **kwargs)
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,322 @@
+import asyncio
+import heapq
+import json
+import logging
+import time
+from datetime import timedelta
+from itertools import takewhile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from core.models import Comment, Post
+from .conditional import select_scalars
+
+logger = logging.getLogger(__name__)
+
+FETCH_LIMIT = 500
+HISTORY_TYPES = {'+': 'created', '~': 'updated', '-': 'deleted'}
+SOURCES = (
+    # (event prefix, history model, fields sent in `changes`, {extra key: lookup})
+    ('post', Post.history.model, ['nazwa', 'opis', 'status', 'przypisany_uzytkownik_id', 'image'], {}),
+    ('comment', Comment.history.model, ['content'],
+     {'post_id': 'post_id', 'author_id': 'author_id', 'author': 'author__username'}),
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def encode_cursor(cursor):
+    return '.'.join(str(value) for value in cursor)
+
+
+def decode_cursor(value):
+    """`"<post history_id>.<comment history_id>"` -> tuple, ValueError if malformed."""
+    parts = tuple(int(part) for part in value.split('.'))
+    if len(parts) != len(SOURCES) or min(parts) < 0:
+        raise ValueError(value)
+    return parts
+
+
+def horizon():
+    """
+    Rows recorded after this moment are not streamed yet: a transaction that
+    got a lower history_id may still commit, and the cursor must not pass it.
+    The same idea as SYNC_SAFETY_LAG in `posts.sync`.
+    """
+    return timezone.now() - timedelta(seconds=_setting('SSE_SAFETY_LAG', 2))
+
+
+def current_cursor():
+    """Cursor just before the first history row younger than SSE_SAFETY_LAG."""
+    moment = horizon()
+    columns = []
+    for _, history, _, _ in SOURCES:
+        columns.append(history.objects.filter(history_date__gt=moment).order_by('history_id')
+                       .values('history_id')[:1])
+        columns.append(history.objects.order_by('-history_id').values('history_id')[:1])
+    values = select_scalars(columns)
+    return tuple(
+        recent - 1 if recent is not None else latest or 0
+        for recent, latest in zip(values[::2], values[1::2])
+    )
+
+
+def _previous_records(history, fields, rows, after):
+    """Last record at or before the cursor for each object first seen in `rows`."""
+    ids = {row['id'] for row in rows if row['history_type'] == '~'}
+    if not ids:
+        return {}
+    latest = (
+        history.objects.filter(id__in=ids, history_id__lte=after)
+        .values('id').annotate(last=Max('history_id')).values('last')
+    )
+    return {
+        row['id']: row
+        for row in history.objects.filter(history_id__in=latest).values('id', *fields)
+    }
+
+
+def _events(prefix, history, fields, extra, after, until, limit, moment):
+    rows = history.objects.filter(history_id__gt=after)
+    if until is not None:
+        rows = rows.filter(history_id__lte=until)
+    rows = list(
+        rows.order_by('history_id')
+        .values('history_id', 'history_date', 'history_type', 'id', *fields, *extra.values())[:limit]
+    )
+    if moment is not None:
+        rows = list(takewhile(lambda row: row['history_date'] <= moment, rows))
+    previous = _previous_records(history, fields, rows, after)
+    for row in rows:
+        older = previous.get(row['id'])
+        event = {
+            'type': f"{prefix}.{HISTORY_TYPES[row['history_type']]}",
+            'id': row['id'],
+            'at': row['history_date'],
+        }
+        for name, lookup in extra.items():
+            event[name] = row[lookup]
+        if row['history_type'] != '-':
+            event['changes'] = {
+                name: row[name] for name in fields
+                if (older[name] != row[name] if older else row[name] not in (None, ''))
+            }
+        previous[row['id']] = row
+        yield row['history_date'], row['history_id'], event
+
+
+def fetch_events(after, until=None, limit=FETCH_LIMIT):
+    """
+    Change events recorded after cursor `after` (and at or before `until`),
+    oldest first, as (cursor, event) pairs. Each cursor covers every event
+    before it, so a client can resume from any of them. Without `until`
+    each source stops before its first row younger than SSE_SAFETY_LAG.
+    """
+    moment = horizon() if until is None else None
+    streams = []
+    for index, (prefix, history, fields, extra) in enumerate(SOURCES):
+        events = _events(prefix, history, fields, extra, after[index], until and until[index], limit, moment)
+        streams.append([(date, index, history_id, event) for date, history_id, event in events])
+
+    cursor = list(after)
+    result = []
+    for _, index, history_id, event in heapq.merge(*streams, key=lambda item: item[0]):
+        if len(result) == limit:
+            break
+        cursor[index] = history_id
+        result.append((tuple(cursor), event))
+    return result
+
+
+def format_event(cursor, event, name='change'):
+    data = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {encode_cursor(cursor)}\nevent: {name}\ndata: {data}\n\n'
+
+
+def _release_connection():
+    # Long-lived streams are outside the request cycle that normally recycles
+    # connections; never close one in the middle of a transaction though.
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def _fetch(after, until=None, limit=FETCH_LIMIT):
+    _release_connection()
+    try:
+        return fetch_events(after, until, limit)
+    finally:
+        _release_connection()
+
+
+def _fetch_cursor():
+    _release_connection()
+    return current_cursor()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets `Accept: text/event-stream` through content negotiation; errors become an `error` event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f'event: error\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'.encode()
+
+
+class Broadcaster:
+    """
+    One poller per process shared by every subscriber: it reads new history
+    rows once per SSE_POLL_INTERVAL (sooner when a local save calls
+    `notify()`) and fans the events out to per-subscriber queues, so idle
+    subscribers cost a queue each and no database work.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.cursor = None
+        self.loop = None
+        self.wake = None
+        self.started = None
+        self.task = None
+
+    async def subscribe(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self.task is None or self.task.done():
+            self.loop = loop
+            self.wake = asyncio.Event()
+            self.subscribers = set()
+            self.started = loop.create_future()
+            self.task = loop.create_task(self.run())
+        await asyncio.shield(self.started)
+        # No await between reading the cursor and registering the queue: every
+        # event after `self.cursor` reaches the queue, none before it does.
+        queue = asyncio.Queue(maxsize=_setting('SSE_QUEUE_SIZE', 1000))
+        self.subscribers.add(queue)
+        return queue, self.cursor
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def notify(self):
+        """Thread-safe: wake the poller now instead of at the next interval."""
+        loop, wake = self.loop, self.wake
+        if loop is not None and wake is not None and self.subscribers:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+    async def run(self):
+        try:
+            self.cursor = await sync_to_async(_fetch_cursor)()
+        except Exception as exc:
+            self.started.set_exception(exc)
+            return
+        self.started.set_result(True)
+
+        interval = _setting('SSE_POLL_INTERVAL', 2.0)
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self.subscribers:
+                return
+            self.wake.clear()
+            try:
+                events = await sync_to_async(_fetch)(self.cursor, None, FETCH_LIMIT)
+            except DatabaseError:
+                logger.exception('SSE poll failed')
+                continue
+            for cursor, event in events:
+                self.cursor = cursor
+                for queue in list(self.subscribers):
+                    self.publish(queue, cursor, event)
+            if len(events) == FETCH_LIMIT:
+                self.wake.set()
+
+    def publish(self, queue, cursor, event):
+        try:
+            queue.put_nowait((cursor, event))
+        except asyncio.QueueFull:
+            # Too slow to keep up: end its stream, it resumes from the database.
+            self.subscribers.discard(queue)
+            queue.get_nowait()
+            queue.put_nowait((cursor, None))
+
+
+broadcaster = Broadcaster()
+
+
+def _replay_or_reset(after, until):
+    """Events between two cursors, or None when the gap exceeds SSE_MAX_REPLAY."""
+    max_replay = _setting('SSE_MAX_REPLAY', 1000)
+    events = _fetch(after, until, limit=max_replay + 1)
+    return None if len(events) > max_replay else events
+
+
+def _preamble():
+    return f"retry: {_setting('SSE_RETRY_MS', 3000)}\n\n"
+
+
+async def stream_async(after):
+    queue, live = await broadcaster.subscribe()
+    try:
+        yield _preamble()
+        replay = await sync_to_async(_replay_or_reset)(after, live) if after is not None else []
+        if replay is None:
+            yield format_event(live, {'type': 'reset'}, name='reset')
+        else:
+            for cursor, event in replay:
+                yield format_event(cursor, event)
+            yield format_event(replay[-1][0] if replay else live, {'type': 'ready'}, name='ready')
+
+        heartbeat = _setting('SSE_HEARTBEAT', 15)
+        while True:
+            try:
+                cursor, event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if event is None:
+                yield format_event(cursor, {'type': 'reset'}, name='reset')
+                return
+            yield format_event(cursor, event)
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+def stream_sync(after):
+    """
+    WSGI fallback, only with SSE_WSGI_STREAMING: poll for SSE_WSGI_TIMEOUT
+    seconds and end the response; EventSource reconnects with Last-Event-ID
+    and carries on. It keeps a sync worker busy meanwhile, which is why it is
+    off by default.
+    """
+    yield _preamble()
+    cursor = after if after is not None else _fetch_cursor()
+    replay = _replay_or_reset(cursor, None) if after is not None else []
+    if replay is None:
+        cursor = _fetch_cursor()
+        yield format_event(cursor, {'type': 'reset'}, name='reset')
+    else:
+        for cursor, event in replay:
+            yield format_event(cursor, event)
+        yield format_event(cursor, {'type': 'ready'}, name='ready')
+
+    deadline = time.monotonic() + _setting('SSE_WSGI_TIMEOUT', 25)
+    while time.monotonic() < deadline:
+        time.sleep(_setting('SSE_POLL_INTERVAL', 2.0))
+        events = _fetch(cursor)
+        for cursor, event in events:
+            yield format_event(cursor, event)
+        if not events:
+            yield ': ping\n\n'
@@ -0,0 +1,28 @@
+from rest_framework.filters import BaseFilterBackend
+
+from core.search import search_posts, search_terms
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    search_param = 'search'
+    search_description = 'Wyszukiwanie pełnotekstowe w tytule, treści i komentarzach.'
+
+    def get_search_query(self, request):
+        return request.query_params.get(self.search_param, '')
+
+    def is_searching(self, request):
+        return bool(search_terms(self.get_search_query(request)))
+
+    def filter_queryset(self, request, queryset, view):
+        return search_posts(queryset, self.get_search_query(request))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': self.search_description,
+                'schema': {'type': 'string'},
+            },
+        ]
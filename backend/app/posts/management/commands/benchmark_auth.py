@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from posts.authentication import CachedTokenAuthentication, local_cache
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Porównuje liczbę zapytań i czas uwierzytelniania tokenem z cache i bez'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='benchmark_auth')
+        token, _ = Token.objects.get_or_create(user=user)
+        factory = APIRequestFactory()
+        local_cache.clear()
+
+        for authentication in (TokenAuthentication(), CachedTokenAuthentication()):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    request = Request(
+                        factory.get('/api/users/me/', HTTP_AUTHORIZATION=f'Token {token.key}')
+                    )
+                    authentication.authenticate(request)
+                elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f'{type(authentication).__name__}: '
+                f"{len(ctx.captured_queries) / options['requests']:.3f} zapytań/żądanie, "
+                f"{elapsed / options['requests'] * 1e6:.1f} µs/żądanie"
+            )
@@ -0,0 +1,210 @@
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.images import ImageVariantError, ensure_variant, source_name
+
+# `name.<12 hex chars>.ext` (see core.images.post_image_path); the storage
+# may still append `_abcdefg` when the same content is uploaded twice.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}(_[A-Za-z0-9]{7})?\.[A-Za-z0-9]+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'max-age=31536000, immutable'
+SIGNING_SALT = 'posts.media'
+
+
+class FileRange:
+    """Read-only view of `length` bytes of `file` starting at `start`."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def is_hashed(name):
+    source = source_name(name)
+    return bool(HASHED_NAME.search(source[1] if source else name))
+
+
+def is_public():
+    return getattr(settings, 'MEDIA_ACCESS', 'public') == 'public'
+
+
+def link_expiry():
+    """
+    Expiry of a link signed now: at least MEDIA_LINK_TTL seconds ahead and
+    rounded to a multiple of it, so the same file gets the same link (and an
+    API response the same body) for a whole TTL step.
+    """
+    ttl = getattr(settings, 'MEDIA_LINK_TTL', 3600)
+    return (int(time.time()) // ttl + 2) * ttl
+
+
+def _signature(name, expires):
+    return signing.Signer(salt=SIGNING_SALT).signature(f'{name}:{expires}')
+
+
+def signed_url(name, url):
+    """`url` of media file `name`, with an expiring signature unless media is public."""
+    if is_public() or not name or not url:
+        return url
+    expires = link_expiry()
+    query = urlencode({'expires': expires, 'sig': _signature(name, expires)})
+    return f"{url}{'&' if '?' in url else '?'}{query}"
+
+
+def has_valid_signature(request, path):
+    expires, signature = request.GET.get('expires', ''), request.GET.get('sig', '')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return signing.constant_time_compare(signature, _signature(path, expires))
+
+
+def has_access(request, path):
+    """
+    Public media is open to everyone. Otherwise a request needs a link from
+    `signed_url` that has not expired (an <img> cannot send headers) or a
+    token accepted by the API.
+    """
+    if is_public() or has_valid_signature(request, path):
+        return True
+    drf_request = Request(request, authenticators=[cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return drf_request.user.is_authenticated
+    except APIException:
+        return False
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of a single satisfiable byte range, None to serve the
+    whole file (no header, or several ranges) or raise ValueError when the
+    range cannot be satisfied.
+    """
+    match = RANGE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def resolve(path):
+    prefixes = getattr(settings, 'MEDIA_SERVE_PREFIXES', ('post_images/', 'variants/'))
+    if not path.startswith(tuple(prefixes)):
+        raise Http404()
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+
+    if not os.path.isfile(full_path):
+        source = source_name(path)
+        if source is None:
+            raise Http404()
+        try:
+            ensure_variant(source[1], source[0])
+        except (ImageVariantError, SuspiciousFileOperation):
+            raise Http404()
+    return full_path
+
+
+def offload(response, path, full_path):
+    mode = getattr(settings, 'MEDIA_OFFLOAD', '')
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix + quote(path)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        return False
+    return True
+
+
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators, conditional GET and single
+    `Range` support. Names that embed a content hash are cacheable forever.
+    With MEDIA_OFFLOAD set, Django only runs the checks and hands the
+    transfer itself to nginx (X-Accel-Redirect) or Apache (X-Sendfile).
+    """
+    if not has_access(request, path):
+        return HttpResponse(status=401)
+    full_path = resolve(path)
+
+    stat = os.stat(full_path)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    visibility = 'public' if is_public() else 'private'
+    cache_control = f'{visibility}, {IMMUTABLE}' if is_hashed(path) else f'{visibility}, no-cache'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    if offload(response, path, full_path):
+        headers = {}
+    else:
+        byte_range = None
+        if request.headers.get('If-Range', etag) in (etag, http_date(stat.st_mtime)):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+
+        file = open(full_path, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+            headers = {}
+        else:
+            start, end = byte_range
+            response = FileResponse(FileRange(file, start, end - start + 1), content_type=content_type, status=206)
+            headers = {
+                'Content-Length': end - start + 1,
+                'Content-Range': f'bytes {start}-{end}/{stat.st_size}',
+            }
+
+    headers.update({
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    })
+    for header, value in headers.items():
+        response[header] = value
+    return response
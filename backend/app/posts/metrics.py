@@ -0,0 +1,287 @@
+import bisect
+import hmac
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+from core import jobs
+
+from . import cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+current_sample = ContextVar('current_sample', default=None)
+
+
+class Sample:
+    """What one request spent; filled in by the query wrapper and the middleware."""
+    __slots__ = ('started', 'view', 'queries', 'db_time', 'render_time', 'sql')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.sql = None
+
+
+def record_query(execute, sql, params, many, context):
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db_time += time.perf_counter() - started
+        if sample.sql is not None:
+            sample.sql.append(sql)
+
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_wrapper)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Aggregates keyed by (view, method, status) for this worker process only;
+    every series carries a `pid` label, so sum them over `pid` in queries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {}
+
+    def reset(self):
+        with self._lock:
+            self.series = {}
+
+    def observe(self, key, duration, queries, db_time, render_time, size):
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    'duration': Histogram(LATENCY_BUCKETS),
+                    'queries': Histogram(QUERY_BUCKETS),
+                    'size': Histogram(SIZE_BUCKETS),
+                    'db_seconds': 0.0,
+                    'render_seconds': 0.0,
+                }
+            series['duration'].observe(duration)
+            series['queries'].observe(queries)
+            if size is not None:
+                series['size'].observe(size)
+            series['db_seconds'] += db_time
+            series['render_seconds'] += render_time
+
+    def render(self):
+        with self._lock:
+            items = sorted(self.series.items())
+            lines = []
+            for name, kind, help_text, histogram, key in (
+                ('api_request_duration_seconds', 'histogram', 'Czas obsługi żądania.', True, 'duration'),
+                ('api_request_db_queries', 'histogram', 'Liczba zapytań SQL na żądanie.', True, 'queries'),
+                ('api_response_size_bytes', 'histogram', 'Rozmiar odpowiedzi.', True, 'size'),
+                ('api_request_db_seconds_total', 'counter', 'Łączny czas zapytań SQL.', False, 'db_seconds'),
+                ('api_request_render_seconds_total', 'counter', 'Łączny czas renderowania odpowiedzi.', False,
+                 'render_seconds'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, series in items:
+                    label_text = _labels(labels)
+                    if histogram:
+                        lines.extend(_histogram_lines(name, label_text, series[key]))
+                    else:
+                        lines.append(f'{name}{{{label_text}}} {series[key]:.6f}')
+        return lines
+
+
+def _labels(key):
+    view, method, status = key
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"')  # noqa: E731
+    return f'view="{escape(view)}",method="{method}",status="{status}",pid="{os.getpid()}"'
+
+
+def _histogram_lines(name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+        cumulative += count
+        le = bound if bound == '+Inf' else repr(float(bound))
+        yield f'{name}_bucket{{{labels},le="{le}"}} {cumulative}'
+    yield f'{name}_sum{{{labels}}} {histogram.total:.6f}'
+    yield f'{name}_count{{{labels}}} {histogram.count}'
+
+
+registry = Registry()
+
+
+def view_label(view_func, method):
+    """`PostViewSet.list` for viewsets, `ExportView.get` for API views, else the function name."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+    return f'{cls.__name__}.{method.lower()}'
+
+
+class MetricsMiddleware:
+    """
+    Time every request and count its SQL queries, then add the numbers to the
+    worker-local `registry` (served by `metrics_view`) and, with
+    METRICS_SERVER_TIMING, to a `Server-Timing` header. "app" in that header
+    is the view time outside the database, i.e. mostly serialization.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        sample = Sample()
+        token = current_sample.set(sample)
+        request.metrics_sample = sample
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, sample)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+        sample = Sample()
+        token = current_sample.set(sample)
+        request.metrics_sample = sample
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return self.finish(request, response, sample)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = getattr(request, 'metrics_sample', None)
+        if sample is not None:
+            sample.view = view_label(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        sample = getattr(request, 'metrics_sample', None)
+        if sample is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                sample.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, sample):
+        if sample.view is None or sample.view == 'metrics_view':
+            return response
+        duration = time.perf_counter() - sample.started
+        size = None if response.streaming else len(response.content)
+        registry.observe(
+            (sample.view, request.method, response.status_code),
+            duration, sample.queries, sample.db_time, sample.render_time, size,
+        )
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            app_time = max(duration - sample.db_time - sample.render_time, 0.0)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={sample.db_time * 1000:.1f};desc="{sample.queries} queries"',
+                f'app;dur={app_time * 1000:.1f}',
+                f'render;dur={sample.render_time * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ])
+        return response
+
+
+def job_lines():
+    """Background queue state; read from the database, so the same on every worker."""
+    try:
+        stats = jobs.queue_stats()
+    except DatabaseError:
+        return []
+    lines = ['# HELP api_jobs Zadania w tle według nazwy i stanu.', '# TYPE api_jobs gauge']
+    for (name, status), total in sorted(stats['counts'].items()):
+        lines.append(f'api_jobs{{name="{name}",status="{status}"}} {total}')
+    lines += [
+        '# HELP api_job_queue_lag_seconds Wiek najstarszego zadania czekającego na wykonanie.',
+        '# TYPE api_job_queue_lag_seconds gauge',
+        f"api_job_queue_lag_seconds {stats['lag_seconds']:.3f}",
+        '# HELP api_job_duration_seconds Czas wykonania zadań zakończonych w ostatniej godzinie.',
+        '# TYPE api_job_duration_seconds summary',
+    ]
+    for name, (total, seconds) in sorted(stats['durations'].items()):
+        lines.append(f'api_job_duration_seconds_sum{{name="{name}"}} {seconds:.6f}')
+        lines.append(f'api_job_duration_seconds_count{{name="{name}"}} {total}')
+    return lines
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the metrics of the worker that answers.
+    Request and cache series are per process (labelled with `pid`), so a
+    scrape through the load balancer sees one worker at a time; the job
+    series come from the database and are the same everywhere. Outside
+    DEBUG it needs METRICS_TOKEN.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse('Ustaw METRICS_TOKEN, aby udostępnić /metrics.\n', status=403,
+                            content_type='text/plain; charset=utf-8')
+
+    lines = registry.render()
+    pid = os.getpid()
+    for name, value in cache.stats.as_dict().items():
+        lines.append(f'# TYPE api_response_cache_{name}_total counter')
+        lines.append(f'api_response_cache_{name}_total{{pid="{pid}"}} {value}')
+    lines.extend(job_lines())
+    lines.append('# TYPE api_worker_info gauge')
+    lines.append(f'api_worker_info{{pid="{pid}"}} 1')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
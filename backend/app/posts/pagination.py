@@ -0,0 +1,208 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+import operator
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    The cursor stores the ordering values of the boundary row, so every page
+    is a single indexed `WHERE (created_at, id) > (...)` query no matter how
+    deep the client pages. Views may override the ordering with
+    `keyset_ordering` or a per-request `get_keyset_ordering()`; annotated
+    keys (e.g. a search rank) are supported as well as model fields.
+    """
+    ordering = ('-created_at', 'id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Niepoprawny kursor.'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'API_PAGE_SIZE', 20)
+        max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                page_size = int(value)
+            except ValueError:
+                pass
+        return max(1, min(page_size, max_page_size))
+
+    def get_ordering(self, view):
+        if hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering())
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return getattr(settings, 'API_PAGINATION_INCLUDE_COUNT', True)
+        return value.lower() not in ('0', 'false', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset, count_queryset = self._prepare(queryset, request, view)
+        self.count = count_queryset.count() if count_queryset is not None else None
+        return self._finish(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, on the async ORM."""
+        page_queryset, count_queryset = self._prepare(queryset, request, view)
+        self.count = await count_queryset.acount() if count_queryset is not None else None
+        return self._finish([row async for row in page_queryset])
+
+    def _prepare(self, queryset, request, view):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(view)
+        self.model = queryset.model
+
+        queryset = queryset.order_by(*self.fields)
+        count_queryset = queryset if self.include_count(request) else None
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor['r'])
+        if self.cursor is not None:
+            queryset = queryset.filter(self._keyset_filter(self.cursor['p'], self.reverse))
+        if self.reverse:
+            queryset = queryset.order_by(*[self._invert(field) for field in self.fields])
+        return queryset[:self.page_size + 1], count_queryset
+
+    def _finish(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Kursor kolejnej lub poprzedniej strony.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Liczba wyników na stronę.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Ustaw na 0, aby pominąć zliczanie wszystkich wyników.',
+                'schema': {'type': 'boolean'},
+            },
+        ]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, obj, reverse):
+        position = [self._position_value(obj, field) for field in self.fields]
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(position, reverse)
+        )
+
+    def _position_value(self, obj, field):
+        name = self._field_name(field)
+        value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def encode_cursor(self, position, reverse):
+        raw = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(urlsafe_b64decode(padded.encode()).decode())
+            position = cursor['p']
+            if len(position) != len(self.fields):
+                raise ValueError
+            cursor['p'] = [
+                self._parse_position_value(field, value)
+                for field, value in zip(self.fields, position)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _parse_position_value(self, field, value):
+        try:
+            model_field = self.model._meta.get_field(self._field_name(field))
+        except FieldDoesNotExist:
+            return value
+        return model_field.to_python(value)
+
+    def _keyset_filter(self, position, reverse):
+        conditions = []
+        for index, field in enumerate(self.fields):
+            name = self._field_name(field)
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            equal = {self._field_name(f): v for f, v in zip(self.fields[:index], position)}
+            conditions.append(Q(**equal) & Q(**{f'{name}__{lookup}': position[index]}))
+        return reduce(operator.or_, conditions)
+
+    @staticmethod
+    def _field_name(field):
+        return field.lstrip('-')
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
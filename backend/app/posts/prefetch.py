@@ -0,0 +1,68 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def optimize_queryset(queryset, serializer, required=()):
+    """
+    Narrow `queryset` to what `serializer` will read.
+
+    Forward relations rendered by the serializer (nested serializers or dotted
+    sources such as `author.username`) become `select_related`, reverse
+    relations rendered with `many=True` become a `Prefetch` whose queryset is
+    planned the same way, and every level is limited with `only()`.
+    `required` names extra columns the caller needs, e.g. pagination keys.
+    """
+    only, select, prefetch = _plan(serializer, queryset.model)
+    only.update(required)
+    return queryset.select_related(*select).prefetch_related(*prefetch).only(*only)
+
+
+def _plan(serializer, model, prefix=''):
+    only = {prefix + model._meta.pk.name}
+    select, prefetch = set(), []
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        attrs = field.source_attrs
+        try:
+            model_field = model._meta.get_field(attrs[0])
+        except FieldDoesNotExist:
+            continue
+        path = prefix + attrs[0]
+
+        if model_field.many_to_one or model_field.one_to_one:
+            if isinstance(field, serializers.BaseSerializer):
+                select.add(path)
+                nested_only, nested_select, nested_prefetch = _plan(
+                    field, model_field.related_model, path + '__'
+                )
+                only |= nested_only
+                select |= nested_select
+                prefetch += nested_prefetch
+            elif len(attrs) > 1:
+                select.add(path)
+                only.add(f'{path}__{attrs[1]}')
+            else:
+                only.add(path)
+        elif model_field.one_to_many or model_field.many_to_many:
+            prefetch.append(_prefetch(field, model_field, path))
+        else:
+            only.add(path)
+
+    return only, select, prefetch
+
+
+def _prefetch(field, model_field, path):
+    related_model = model_field.related_model
+    queryset = related_model._default_manager.all()
+    child = getattr(field, 'child', None)
+    if not isinstance(child, serializers.BaseSerializer):
+        return Prefetch(path, queryset=queryset)
+
+    only, select, prefetch = _plan(child, related_model)
+    if model_field.one_to_many:
+        only.add(model_field.field.name)
+    queryset = queryset.select_related(*select).prefetch_related(*prefetch).only(*only)
+    return Prefetch(path, queryset=queryset)
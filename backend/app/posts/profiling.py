@@ -0,0 +1,145 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import Sample, current_sample, view_label
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_QUERIES': 20,
+    'MAX_DURATION_MS': 500,
+    'REPEAT_THRESHOLD': 5,
+    'VIEW_BUDGETS': {},
+    'PROFILE_DIR': '',
+    'PROFILE_SAMPLE_RATE': 0.0,
+}
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+IN_LISTS = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+
+
+def slow_request_settings():
+    return {**DEFAULTS, **getattr(settings, 'SLOW_REQUESTS', {})}
+
+
+def normalize_sql(sql):
+    """SQL with literals and IN-lists replaced, so queries differing only by parameters compare equal."""
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', ' '.join(sql.split())))
+
+
+def repeated_queries(statements, threshold):
+    """[(normalized sql, count)] for statements run at least `threshold` times, most frequent first."""
+    counts = Counter(normalize_sql(sql) for sql in statements)
+    return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+
+def check_budget(statements, duration_ms=None, max_queries=None, max_duration_ms=None, repeat_threshold=None):
+    """Human-readable budget violations; empty when the request is within budget."""
+    problems = []
+    if max_queries is not None and len(statements) > max_queries:
+        problems.append(f'{len(statements)} zapytań SQL (limit {max_queries})')
+    if max_duration_ms is not None and duration_ms is not None and duration_ms > max_duration_ms:
+        problems.append(f'{duration_ms:.0f} ms (limit {max_duration_ms} ms)')
+    if repeat_threshold:
+        for sql, count in repeated_queries(statements, repeat_threshold):
+            problems.append(f'N+1: {count}x {sql}')
+    return problems
+
+
+class SlowRequestMiddleware:
+    """
+    Opt-in (SLOW_REQUESTS['ENABLED']) detector for requests over their query
+    or latency budget and for repeated near-identical SQL. Offenders are
+    logged; a PROFILE_SAMPLE_RATE share of sync requests runs under cProfile
+    and the profile is kept in PROFILE_DIR when the request turns out to be
+    an offender. Place it after MetricsMiddleware to share its query counter.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = slow_request_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        sample, token = self.start(request)
+        profiler = None
+        if config['PROFILE_DIR'] and random.random() < config['PROFILE_SAMPLE_RATE']:
+            profiler = cProfile.Profile()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            if token is not None:
+                current_sample.reset(token)
+        self.finish(request, response, sample, config, profiler)
+        return response
+
+    async def __acall__(self, request):
+        # cProfile only sees the event loop thread, so async requests are not profiled.
+        config = slow_request_settings()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        sample, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                current_sample.reset(token)
+        self.finish(request, response, sample, config, None)
+        return response
+
+    def start(self, request):
+        sample, token = getattr(request, 'metrics_sample', None), None
+        if sample is None:
+            sample = request.metrics_sample = Sample()
+            token = current_sample.set(sample)
+        sample.sql = []
+        request.slow_request_started = time.perf_counter()
+        return sample, token
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = getattr(request, 'metrics_sample', None)
+        if sample is not None and sample.view is None:
+            sample.view = view_label(view_func, request.method)
+
+    def finish(self, request, response, sample, config, profiler):
+        view = sample.view or request.path
+        duration_ms = (time.perf_counter() - request.slow_request_started) * 1000
+        budget = {
+            'max_queries': config['MAX_QUERIES'],
+            'max_duration_ms': config['MAX_DURATION_MS'],
+            'repeat_threshold': config['REPEAT_THRESHOLD'],
+            **config['VIEW_BUDGETS'].get(view, {}),
+        }
+        problems = check_budget(sample.sql, duration_ms, **budget)
+        if not problems:
+            return
+        logger.warning('Wolne żądanie %s %s (%s): %s', request.method, request.get_full_path(), view,
+                       '; '.join(problems))
+        if profiler is not None:
+            directory = Path(config['PROFILE_DIR'])
+            directory.mkdir(parents=True, exist_ok=True)
+            # Unresolved requests are labelled with their path; keep it one file name.
+            label = re.sub(r'[^\w.-]', '_', view)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{label}-{duration_ms:.0f}ms.prof"
+            profiler.dump_stats(directory / name)
@@ -0,0 +1,33 @@
+"""
+Query budgets for tests, enabled by `pytest_plugins` in the root conftest:
+
+    def test_posts_list(auth_client, query_budget):
+        with query_budget(4, repeat_threshold=3):
+            auth_client.get('/api/posts/')
+
+The block fails the test when it runs more queries than allowed or repeats
+the same statement `repeat_threshold` times (an N+1).
+"""
+from contextlib import contextmanager
+
+import pytest
+
+
+@pytest.fixture
+def query_budget():
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    from posts.profiling import check_budget
+
+    @contextmanager
+    def budget(max_queries, repeat_threshold=None, using='default'):
+        with CaptureQueriesContext(connections[using]) as captured:
+            yield captured
+        statements = [query['sql'] for query in captured.captured_queries]
+        problems = check_budget(statements, max_queries=max_queries, repeat_threshold=repeat_threshold)
+        if problems:
+            pytest.fail('Przekroczony budżet zapytań:\n' + '\n'.join(problems) +
+                        '\n\nZapytania:\n' + '\n'.join(statements), pytrace=False)
+
+    return budget
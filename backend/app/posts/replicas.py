@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from core.routers import replica_alias, set_read_alias
+
+PINNED_KEY = 'db:pinned:{}'
+
+
+def sticky_seconds():
+    return getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 5)
+
+
+def pins_are_shared():
+    """Pins live in the default cache; only a shared one makes them visible to every worker."""
+    return getattr(settings, 'SHARED_CACHE', False)
+
+
+def pin_to_primary(user):
+    """Serve `user`'s reads from the primary for the next DB_REPLICA_STICKY_SECONDS."""
+    if user is not None and user.is_authenticated and sticky_seconds() > 0:
+        cache.set(PINNED_KEY.format(user.pk), 1, timeout=sticky_seconds())
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and cache.get(PINNED_KEY.format(user.pk)) is not None
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe-method requests from the read replica (DB_REPLICA_ALIAS),
+    leaving writes and the rest of the request cycle on the primary.
+
+    Authentication and permission checks still read the primary; the
+    routing starts after them and ends in `finalize_response`. A successful
+    unsafe request pins its user to the primary for
+    DB_REPLICA_STICKY_SECONDS, so they read their own writes while the
+    replica catches up. Without a replica configured this is a no-op, and
+    so it is without a shared cache (SHARED_CACHE): a pin kept in one
+    worker's memory would not stop the next request, served by another
+    worker, from reading the replica.
+    """
+    replica_reads = True
+
+    def get_read_alias(self, request):
+        if not self.replica_reads or request.method not in SAFE_METHODS:
+            return None
+        alias = replica_alias()
+        if alias is None or not pins_are_shared() or is_pinned(request.user):
+            return None
+        return alias
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.read_alias = self.get_read_alias(request)
+        if self.read_alias is not None:
+            self.previous_read_alias = set_read_alias(self.read_alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'read_alias', None) is not None:
+            set_read_alias(self.previous_read_alias)
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return response
@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
+from core.images import variant_name, variant_urls
 from core.models import Post, Comment
+from django.db import models
+from .media import signed_url
 
 class RegisterUserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -25,6 +28,53 @@ class RegisterUserSerializer(serializers.ModelSerializer):
         return data
 
 
+class DynamicFieldsMixin:
+    """
+    Accepts `fields` (sparse fieldset) and `expand` (opt-in for the fields
+    listed in `Meta.expandable_fields`). Passing neither keeps every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        if expand is not None:
+            for name in set(getattr(self.Meta, 'expandable_fields', ())) - set(expand):
+                self.fields.pop(name, None)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ImageVariantsField(serializers.Field):
+    """URLs of the resized variants of an image field, keyed by variant name."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance).name
+
+    def to_representation(self, value):
+        urls = variant_urls(value)
+        request = self.context.get('request')
+        if urls and request is not None:
+            urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+        if urls:
+            urls = {variant: signed_url(variant_name(value, variant), url) for variant, url in urls.items()}
+        return urls
+
+
+class SignedImageField(serializers.ImageField):
+    """ImageField whose URL carries an expiring signature for non-public media."""
+
+    def to_representation(self, value):
+        url = super().to_representation(value)
+        return signed_url(value.name, url) if url else url
+
+
 class SimpleUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -41,27 +91,116 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['author', 'author_id', 'created_at', 'updated_at']
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping, models.ImageField: SignedImageField,
+    }
     przypisany_uzytkownik = SimpleUserSerializer(read_only=True)
     przypisany_uzytkownik_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(), source='przypisany_uzytkownik', write_only=True, required=False
     )
     comments = CommentSerializer(many=True, read_only=True)
+    image_variants = ImageVariantsField(source='image')
 
     class Meta:
         model = Post
         fields = [
             'id', 'nazwa', 'opis', 'status', 'przypisany_uzytkownik',
             'przypisany_uzytkownik_id', 'created_at', 'updated_at',
-            'comments', 'image'
+            'comment_count', 'last_comment_at', 'comments', 'image', 'image_variants'
         ]
+        expandable_fields = ['comments']
+
+
+class PostBulkItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    przypisany_uzytkownik_id = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Post
+        fields = ['id', 'nazwa', 'opis', 'status', 'przypisany_uzytkownik_id']
 
 
-class PostHistorySerializer(serializers.ModelSerializer):
+class AssigneeStatsSerializer(serializers.Serializer):
+    id = serializers.IntegerField(allow_null=True)
+    username = serializers.CharField(allow_null=True)
+    posts = serializers.IntegerField()
+    comments = serializers.IntegerField()
+    by_status = serializers.DictField(child=serializers.IntegerField())
+
+
+class PostStatsSerializer(serializers.Serializer):
+    posts = serializers.IntegerField()
+    comments = serializers.IntegerField()
+    last_comment_at = serializers.DateTimeField(allow_null=True)
+    by_status = serializers.DictField(child=serializers.IntegerField())
+    by_assignee = AssigneeStatsSerializer(many=True)
+
+
+class PostHistoryListSerializer(serializers.ListSerializer):
+    """
+    Diffs each record against the next older one in a single pass over the
+    page; `previous_record` in the context is the record just below it.
+    """
+
+    def to_representation(self, data):
+        records = list(data)
+        older = self.context.get('previous_record')
+        changes = []
+        for record in reversed(records):
+            changes.append(self.child.diff(older, record))
+            older = record
+        changes.reverse()
+        return [
+            self.child.to_representation({**record, 'changes': record_changes})
+            for record, record_changes in zip(records, changes)
+        ]
+
+
+class PostHistorySerializer(serializers.Serializer):
+    snapshot_fields = ['nazwa', 'opis', 'status', 'przypisany_uzytkownik', 'image', 'created_at', 'updated_at']
+    ignored_in_diff = {'updated_at'}
+
+    history_id = serializers.IntegerField()
     history_date = serializers.DateTimeField()
-    history_user = serializers.StringRelatedField()
     history_type = serializers.CharField()
+    history_user = serializers.CharField(source='history_user_name', allow_null=True)
+    history_change_reason = serializers.CharField(allow_null=True)
+    id = serializers.IntegerField()
+    nazwa = serializers.CharField()
+    opis = serializers.CharField(allow_null=True)
+    status = serializers.CharField()
+    przypisany_uzytkownik = serializers.IntegerField(allow_null=True)
+    image = serializers.CharField(allow_null=True)
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+    changes = serializers.DictField()
 
     class Meta:
-        model = Post.history.model
-        fields = '__all__'
+        list_serializer_class = PostHistoryListSerializer
+
+    @classmethod
+    def values(cls):
+        return [
+            'history_id', 'history_date', 'history_type', 'history_change_reason', 'id',
+            *cls.snapshot_fields,
+        ]
+
+    def diff(self, older, record):
+        changes = {}
+        for name in self.snapshot_fields:
+            if name in self.ignored_in_diff:
+                continue
+            old = older[name] if older is not None else None
+            if older is None and record[name] in (None, ''):
+                continue
+            if old != record[name]:
+                changes[name] = {'old': old, 'new': record[name]}
+        return changes
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.context.get('changes_only'):
+            for name in self.snapshot_fields:
+                data.pop(name, None)
+        return data
@@ -0,0 +1,43 @@
+from django.db.models import Count, Max, Sum
+
+from core.models import Post
+
+
+def post_stats(queryset):
+    """
+    Dashboard totals for `queryset` from one grouped query over the posts
+    table: comment numbers come from the maintained counters, so the cost
+    does not grow with the number of comments.
+    """
+    rows = (
+        queryset.order_by()
+        .values('status', 'przypisany_uzytkownik_id', 'przypisany_uzytkownik__username')
+        .annotate(posts=Count('pk'), comments=Sum('comment_count'), last_comment_at=Max('last_comment_at'))
+    )
+    statuses = [choice for choice, _ in Post.status_choices]
+    totals = {'posts': 0, 'comments': 0, 'last_comment_at': None, 'by_status': dict.fromkeys(statuses, 0)}
+    assignees = {}
+    for row in rows:
+        totals['posts'] += row['posts']
+        totals['comments'] += row['comments'] or 0
+        totals['by_status'][row['status']] = totals['by_status'].get(row['status'], 0) + row['posts']
+        if row['last_comment_at'] and (
+            totals['last_comment_at'] is None or row['last_comment_at'] > totals['last_comment_at']
+        ):
+            totals['last_comment_at'] = row['last_comment_at']
+
+        assignee = assignees.setdefault(row['przypisany_uzytkownik_id'], {
+            'id': row['przypisany_uzytkownik_id'],
+            'username': row['przypisany_uzytkownik__username'],
+            'posts': 0,
+            'comments': 0,
+            'by_status': dict.fromkeys(statuses, 0),
+        })
+        assignee['posts'] += row['posts']
+        assignee['comments'] += row['comments'] or 0
+        assignee['by_status'][row['status']] = assignee['by_status'].get(row['status'], 0) + row['posts']
+
+    totals['by_assignee'] = sorted(
+        assignees.values(), key=lambda item: (-item['posts'], item['id'] is None, item['id'] or 0),
+    )
+    return totals
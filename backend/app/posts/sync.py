@@ -0,0 +1,93 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import Comment, Post
+from .prefetch import optimize_queryset
+from .serializers import CommentSerializer, PostSerializer
+
+SOURCES = {
+    # The comment counters are updated without touching updated_at, so a
+    # client would never be sent their new values; it has the comments anyway.
+    'posts': (Post, PostSerializer, {
+        'expand': [], 'fields': [name for name in PostSerializer.Meta.fields if name not in Post.counter_fields],
+    }),
+    'comments': (Comment, CommentSerializer, {}),
+}
+
+
+def encode_token(state):
+    raw = json.dumps(state, separators=(',', ':'))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Inverse of `encode_token`; ValueError for anything it did not produce."""
+    try:
+        state = json.loads(urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode()).decode())
+        for name in SOURCES:
+            updated_at, last_id = state[name]
+            if updated_at is not None and parse_datetime(updated_at) is None:
+                raise ValueError(token)
+            int(last_id)
+            int(state['deleted'][name])
+    except (TypeError, KeyError, AttributeError, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError(token) from exc
+    return state
+
+
+def initial_state():
+    # A fresh client loads every live row; deletions only matter from now on.
+    deleted = {}
+    for name, (model, _, _) in SOURCES.items():
+        last = model.history.order_by('-history_id').values_list('history_id', flat=True).first()
+        deleted[name] = last or 0
+    return {**{name: [None, 0] for name in SOURCES}, 'deleted': deleted}
+
+
+def collect_changes(state, page_size, context):
+    """
+    One page of changes after `state`: live rows of every source ordered by
+    (updated_at, id) plus ids deleted since the last history_id seen. Only
+    changes older than SYNC_SAFETY_LAG are returned, so rows committed late
+    with an earlier timestamp are not skipped. Returns (payload, new state).
+    """
+    horizon = timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_SAFETY_LAG', 2))
+    state = {**state, 'deleted': dict(state['deleted'])}
+    payload, deleted, has_more = {}, {}, False
+
+    for name, (model, serializer_class, serializer_kwargs) in SOURCES.items():
+        updated_at, last_id = state[name]
+        queryset = model.objects.filter(updated_at__lt=horizon)
+        if updated_at is not None:
+            updated_at = parse_datetime(updated_at)
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id)
+            )
+        serializer = serializer_class(many=True, context=context, **serializer_kwargs)
+        queryset = optimize_queryset(queryset, serializer.child, required=('updated_at',))
+        rows = list(queryset.order_by('updated_at', 'id')[:page_size + 1])
+        has_more |= len(rows) > page_size
+        rows = rows[:page_size]
+        if rows:
+            state[name] = [rows[-1].updated_at.isoformat(), rows[-1].id]
+        payload[name] = serializer_class(rows, many=True, context=context, **serializer_kwargs).data
+
+        removed = list(
+            model.history.filter(
+                history_type='-', history_id__gt=state['deleted'][name], history_date__lt=horizon,
+            ).order_by('history_id').values_list('history_id', 'id')[:page_size + 1]
+        )
+        has_more |= len(removed) > page_size
+        removed = removed[:page_size]
+        if removed:
+            state['deleted'][name] = removed[-1][0]
+        deleted[name] = [object_id for _, object_id in removed]
+
+    payload['deleted'] = deleted
+    return payload, state, has_more
@@ -5,6 +5,17 @@ from core.models import Post
 
 pytestmark = pytest.mark.django_db
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    from posts.authentication import local_cache
+    cache.clear()
+    local_cache.clear()
+
+@pytest.fixture(autouse=True)
+def eager_jobs(settings):
+    settings.JOBS_EAGER = True
+
 @pytest.fixture
 def client():
     return APIClient()
@@ -58,7 +69,7 @@ def test_filter_posts_by_status(auth_client, user):
     Post.objects.create(nazwa='B', status='Rozwiązany', przypisany_uzytkownik=user)
     response = auth_client.get('/api/posts/', {'status': 'Rozwiązany'})
     assert response.status_code == 200
-    for post in response.data:
+    for post in response.data['results']:
         assert post['status'] == 'Rozwiązany'
 
 def test_delete_post(auth_client, post):
@@ -72,9 +83,1099 @@ def test_post_history(auth_client, post):
     post.save()
     response = auth_client.get(f'/posts/{post.id}/history/')
     assert response.status_code == 200
-    assert len(response.data) >= 1
-    assert any(h['status'] == 'Rozwiązany' for h in response.data)
+    assert len(response.data['results']) >= 1
+    assert any(h['status'] == 'Rozwiązany' for h in response.data['results'])
 
 def test_auth_required(client):
     response = client.get('/api/posts/')
     assert response.status_code == 401
+
+def test_posts_list_cursor_pagination(auth_client, user):
+    posts = [Post.objects.create(nazwa=f'Post {i}', przypisany_uzytkownik=user) for i in range(5)]
+    response = auth_client.get('/api/posts/', {'page_size': 2})
+    assert response.status_code == 200
+    assert response.data['count'] == 5
+    assert response.data['previous'] is None
+
+    seen = [p['id'] for p in response.data['results']]
+    next_url = response.data['next']
+    while next_url:
+        response = auth_client.get(next_url)
+        seen += [p['id'] for p in response.data['results']]
+        next_url = response.data['next']
+    assert seen == [p.id for p in reversed(posts)]
+
+    response = auth_client.get(response.data['previous'])
+    assert [p['id'] for p in response.data['results']] == [posts[2].id, posts[1].id]
+
+def test_posts_list_page_size_is_bounded(auth_client, user, settings):
+    settings.API_MAX_PAGE_SIZE = 3
+    for i in range(5):
+        Post.objects.create(nazwa=f'Post {i}', przypisany_uzytkownik=user)
+    response = auth_client.get('/api/posts/', {'page_size': 1000, 'count': 0})
+    assert len(response.data['results']) == 3
+    assert 'count' not in response.data
+
+def test_invalid_cursor(auth_client):
+    response = auth_client.get('/api/posts/', {'cursor': 'nie-kursor'})
+    assert response.status_code == 404
+
+def _list_query_count(client, url):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    client.get('/api/users/me/')
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+def test_posts_list_query_count_is_constant(auth_client, user):
+    from core.models import Comment
+    other = User.objects.create_user(username='other', password='x')
+
+    def add_posts(count):
+        for i in range(count):
+            p = Post.objects.create(nazwa=f'Post {i}', przypisany_uzytkownik=other)
+            Comment.objects.create(post=p, author=user, content='a')
+            Comment.objects.create(post=p, author=other, content='b')
+
+    add_posts(2)
+    small = _list_query_count(auth_client, '/api/posts/?expand=comments')
+    add_posts(8)
+    large = _list_query_count(auth_client, '/api/posts/?expand=comments')
+    assert small == large
+
+def test_comments_list_query_count_is_constant(auth_client, user, post):
+    from core.models import Comment
+    Comment.objects.create(post=post, author=user, content='a')
+    small = _list_query_count(auth_client, f'/api/posts/{post.id}/comments/')
+    for i in range(9):
+        author = User.objects.create_user(username=f'u{i}', password='x')
+        Comment.objects.create(post=post, author=author, content='b')
+    large = _list_query_count(auth_client, f'/api/posts/{post.id}/comments/')
+    assert small == large
+
+def test_posts_list_sparse_fieldset(auth_client, post):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    with CaptureQueriesContext(connection) as ctx:
+        response = auth_client.get('/api/posts/', {'fields': 'id,nazwa,status'})
+    assert response.status_code == 200
+    assert set(response.data['results'][0]) == {'id', 'nazwa', 'status'}
+    assert not any('"opis"' in q['sql'] for q in ctx.captured_queries)
+
+def test_posts_list_comments_are_expandable(auth_client, user, post):
+    from core.models import Comment
+    Comment.objects.create(post=post, author=user, content='Komentarz')
+    response = auth_client.get('/api/posts/')
+    assert 'comments' not in response.data['results'][0]
+    assert 'opis' in response.data['results'][0]
+
+    response = auth_client.get('/api/posts/', {'expand': 'comments'})
+    assert response.data['results'][0]['comments'][0]['content'] == 'Komentarz'
+
+    response = auth_client.get(f'/api/posts/{post.id}/')
+    assert len(response.data['comments']) == 1
+
+def test_search_ignores_html_markup(auth_client, user):
+    Post.objects.create(nazwa='Awaria drukarki', opis='<p>Drukarka <strong>nie drukuje</strong></p>')
+    response = auth_client.get('/api/posts/', {'search': 'strong'})
+    assert response.data['results'] == []
+    response = auth_client.get('/api/posts/', {'search': 'drukuje'})
+    assert [p['nazwa'] for p in response.data['results']] == ['Awaria drukarki']
+
+def test_search_includes_comments_and_ranks_title_first(auth_client, user):
+    from core.models import Comment
+    in_body = Post.objects.create(nazwa='Serwer', opis='<p>Problem z siecią VPN</p>')
+    in_title = Post.objects.create(nazwa='VPN nie działa', opis='')
+    commented = Post.objects.create(nazwa='Laptop', opis='')
+    Comment.objects.create(post=commented, author=user, content='To przez VPN')
+
+    response = auth_client.get('/api/posts/', {'search': 'vpn'})
+    ids = [p['id'] for p in response.data['results']]
+    assert ids[0] == in_title.id
+    assert set(ids) == {in_body.id, in_title.id, commented.id}
+
+    paged = []
+    url = '/api/posts/?search=vpn&page_size=1'
+    while url:
+        response = auth_client.get(url)
+        paged += [p['id'] for p in response.data['results']]
+        url = response.data['next']
+    assert paged == ids
+
+def test_post_detail_conditional_get(auth_client, user, post):
+    from core.models import Comment
+    url = f'/api/posts/{post.id}/'
+    response = auth_client.get(url)
+    etag = response['ETag']
+    assert response.status_code == 200
+    assert response['Last-Modified']
+
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+    Comment.objects.create(post=post, author=user, content='Nowy komentarz')
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+def test_posts_list_conditional_get_skips_serialization(auth_client, post):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    etag = auth_client.get('/api/posts/')['ETag']
+    with CaptureQueriesContext(connection) as ctx:
+        response = auth_client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not any('FROM "core_post"' in q['sql'] for q in ctx.captured_queries)
+
+    post.status = 'Archiwalny'
+    post.save()
+    assert auth_client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+def test_post_etag_follows_embedded_user_and_skips_search(auth_client, user, post):
+    url = f'/api/posts/{post.id}/'
+    etag = auth_client.get(url)['ETag']
+    user.email = 'nowy@example.com'
+    user.save()
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['przypisany_uzytkownik']['email'] == 'nowy@example.com'
+    assert 'ETag' not in auth_client.get('/api/posts/', {'search': 'testowe'})
+
+def test_post_etag_changes_when_comment_moves_away(auth_client, user, post):
+    from core.models import Comment
+    comment = Comment.objects.create(post=post, author=user, content='Komentarz')
+    other = Post.objects.create(nazwa='Inny')
+    url = f'/api/posts/{post.id}/?expand=comments'
+    etag = auth_client.get(url)['ETag']
+
+    response = auth_client.patch(f'/api/comments/{comment.id}/', {'post': other.id}, format='json')
+    assert response.status_code == 200
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert (response.data['comment_count'], response.data['comments']) == (0, [])
+
+def test_post_history_conditional_get(auth_client, post):
+    url = f'/posts/{post.id}/history/'
+    etag = auth_client.get(url)['ETag']
+    assert auth_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+@pytest.fixture
+def response_cache(settings):
+    # Off by default without a shared cache backend (CACHE_URL).
+    settings.API_RESPONSE_CACHE_ENABLED = True
+
+def test_posts_response_cache_hit_and_invalidation(auth_client, user, post, response_cache):
+    from core.models import Comment
+    from posts.cache import stats
+    stats.reset()
+    first = auth_client.get('/api/posts/', {'status': 'Nowy', 'expand': 'comments'})
+    assert first['X-Cache'] == 'MISS'
+    second = auth_client.get('/api/posts/', {'expand': 'comments', 'status': 'Nowy'})
+    assert second['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert stats.as_dict()['hits'] == 1
+
+    Comment.objects.create(post=post, author=user, content='Nowy')
+    third = auth_client.get('/api/posts/', {'status': 'Nowy', 'expand': 'comments'})
+    assert third['X-Cache'] == 'MISS'
+    assert third.data['results'][0]['comments'][0]['content'] == 'Nowy'
+
+def test_post_comments_response_cache(auth_client, user, post, response_cache):
+    from core.models import Comment
+    url = f'/api/posts/{post.id}/comments/'
+    assert auth_client.get(url)['X-Cache'] == 'MISS'
+    assert auth_client.get(url)['X-Cache'] == 'HIT'
+    Comment.objects.create(post=post, author=user, content='Nowy')
+    response = auth_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert len(response.data['results']) == 1
+
+def test_cached_token_authentication_skips_token_lookup(auth_client):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    auth_client.get('/api/users/me/')
+    with CaptureQueriesContext(connection) as ctx:
+        response = auth_client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.data['username'] == 'testuser'
+    assert len(ctx.captured_queries) == 0
+
+def test_cached_token_invalidated_on_delete_and_deactivation(auth_client, user):
+    from rest_framework.authtoken.models import Token
+    assert auth_client.get('/api/users/me/').status_code == 200
+    user.is_active = False
+    user.save()
+    assert auth_client.get('/api/users/me/').status_code == 401
+
+    user.is_active = True
+    user.save()
+    assert auth_client.get('/api/users/me/').status_code == 200
+    Token.objects.filter(user=user).delete()
+    assert auth_client.get('/api/users/me/').status_code == 401
+
+def test_shared_token_cache_only_with_shared_backend(settings, client, user):
+    from django.core.cache import caches
+    from rest_framework.authtoken.models import Token
+    from posts.authentication import CACHE_KEY, _digest, local_cache
+    key = Token.objects.get_or_create(user=user)[0].key
+    shared_key = CACHE_KEY.format(_digest(key))
+    client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+
+    settings.AUTH_TOKEN_SHARED_CACHE = False
+    assert client.get('/api/users/me/').status_code == 200
+    assert caches[settings.AUTH_TOKEN_CACHE_ALIAS].get(shared_key) is None
+
+    local_cache.clear()
+    settings.AUTH_TOKEN_SHARED_CACHE = True
+    assert client.get('/api/users/me/').status_code == 200
+    assert caches[settings.AUTH_TOKEN_CACHE_ALIAS].get(shared_key) is not None
+
+@pytest.fixture
+def admin_client(client):
+    admin = User.objects.create_superuser(username='admin', password='adminpass')
+    client.force_authenticate(admin)
+    return client
+
+def test_bulk_create_and_status_transition(admin_client, user, post):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    others = [Post.objects.create(nazwa=f'Post {i}') for i in range(20)]
+    payload = [{'id': p.id, 'status': 'Archiwalny'} for p in [post, *others]]
+    payload.append({'nazwa': 'Nowy z paczki', 'przypisany_uzytkownik_id': user.id})
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = admin_client.post('/api/posts/bulk/', payload, format='json')
+    assert response.status_code == 200
+    assert len(ctx.captured_queries) < 20
+    assert [r['result'] for r in response.data['results']] == ['updated'] * 21 + ['created']
+
+    assert Post.objects.filter(status='Archiwalny').count() == 21
+    created = Post.objects.get(nazwa='Nowy z paczki')
+    assert created.przypisany_uzytkownik == user
+    assert post.history.first().status == 'Archiwalny'
+    assert created.history.count() == 1
+
+def test_bulk_is_all_or_nothing(admin_client, post):
+    response = admin_client.post('/api/posts/bulk/', [
+        {'id': post.id, 'status': 'Archiwalny'},
+        {'id': 999999, 'status': 'Aktywny'},
+        {'status': 'Nieznany'},
+    ], format='json')
+    assert response.status_code == 400
+    results = response.data['results']
+    assert 'errors' not in results[0]
+    assert 'id' in results[1]['errors']
+    assert set(results[2]['errors']) == {'nazwa', 'status'}
+    post.refresh_from_db()
+    assert post.status == 'Nowy'
+
+def test_export_streams_ndjson_and_csv(admin_client, user, post):
+    import json
+    from core.models import Comment
+    Comment.objects.create(post=post, author=user, content='Komentarz')
+
+    response = admin_client.get('/api/export/posts/')
+    assert response.status_code == 200
+    assert response.streaming
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [row['nazwa'] for row in rows] == ['Zadanie testowe']
+
+    response = admin_client.get('/api/export/comments/', {'output': 'csv'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0].startswith('id,post_id,author_id,content')
+    assert 'Komentarz' in lines[1]
+
+def test_export_since_is_incremental(admin_client, post):
+    from django.utils import timezone
+    since = timezone.now()
+    Post.objects.create(nazwa='Nowszy')
+    response = admin_client.get('/api/export/posts/', {'since': since.isoformat()})
+    body = b''.join(response.streaming_content).decode()
+    assert 'Nowszy' in body and post.nazwa not in body
+
+def test_export_streams_async_under_asgi(settings, admin_client, post):
+    import json
+    from asgiref.sync import async_to_sync
+    from posts.async_views import aiterate
+    settings.API_ASYNC_VIEWS = True
+    Post.objects.create(nazwa='Drugi')
+
+    response = admin_client.get('/api/export/posts/')
+    assert response.is_async
+
+    async def collect():
+        return b''.join([chunk async for chunk in response.streaming_content])
+    rows = [json.loads(line) for line in async_to_sync(collect)().decode().splitlines()]
+    assert [row['nazwa'] for row in rows] == ['Zadanie testowe', 'Drugi']
+
+    pulled = []
+
+    def numbers():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+
+    async def first_item():
+        items = aiterate(numbers(), batch_size=3)
+        item = await items.__anext__()
+        await items.aclose()
+        return item
+    assert async_to_sync(first_item)() == 0
+    assert pulled == [0, 1, 2]
+
+def test_export_requires_staff(auth_client):
+    assert auth_client.get('/api/export/posts/').status_code == 403
+
+def test_post_history_diffs_and_pagination(auth_client, post):
+    post.status = 'Aktywny'
+    post.save()
+    post.opis = '<p>Opis</p>'
+    post.save()
+
+    response = auth_client.get(f'/posts/{post.id}/history/', {'page_size': 2, 'changes_only': 1})
+    assert response.data['count'] == 3
+    first_page = response.data['results']
+    assert first_page[0]['changes'] == {'opis': {'old': None, 'new': '<p>Opis</p>'}}
+    assert first_page[1]['changes'] == {'status': {'old': 'Nowy', 'new': 'Aktywny'}}
+    assert 'opis' not in first_page[0]
+
+    response = auth_client.get(response.data['next'])
+    created = response.data['results'][0]
+    assert created['history_type'] == '+'
+    assert created['changes']['nazwa'] == {'old': None, 'new': 'Zadanie testowe'}
+    assert response.data['next'] is None
+
+def test_prune_history_compacts_and_archives(post, user, tmp_path):
+    import gzip
+    import json
+    from datetime import timedelta
+    from django.utils import timezone
+    from core.retention import prune_history, retention_policy
+
+    post.save()
+    post.status = 'Aktywny'
+    post.save()
+    post.status = 'Zamknięty'
+    post.save()
+    history = Post.history.filter(id=post.id)
+    old = timezone.now() - timedelta(days=400)
+    history.update(history_date=old)
+    history.order_by('-history_date', '-history_id').filter(
+        history_id=history.order_by('-history_id')[0].history_id
+    ).update(history_date=timezone.now())
+
+    policy = retention_policy(KEEP_DAYS=365, COLLAPSE_SAME_USER_MINUTES=0, ARCHIVE_DIR=str(tmp_path))
+    stats = prune_history(Post.history.model, policy)
+
+    assert (stats.noop, stats.expired) == (1, 1)
+    remaining = list(Post.history.filter(id=post.id).order_by('history_date', 'history_id')
+                     .values_list('history_type', 'status'))
+    assert remaining == [('~', 'Aktywny'), ('~', 'Zamknięty')]
+    with gzip.open(stats.archive, 'rt', encoding='utf-8') as archive:
+        archived = [json.loads(line) for line in archive]
+    assert sorted(row['history_type'] for row in archived) == ['+', '~']
+
+def test_prune_history_collapses_same_user_bursts(post, user):
+    from core.retention import prune_history, retention_policy
+
+    for status in ('Aktywny', 'Zamknięty', 'Nowy'):
+        post.status = status
+        post._history_user = user
+        post.save()
+
+    policy = retention_policy(KEEP_DAYS=0, COLLAPSE_SAME_USER_MINUTES=10, ARCHIVE_DIR='')
+    post.nazwa = 'Zmieniona nazwa'
+    post.save()
+
+    stats = prune_history(Post.history.model, policy, dry_run=True)
+    assert (stats.collapsed, stats.noop) == (2, 1)
+    assert Post.history.filter(id=post.id).count() == 5
+
+    prune_history(Post.history.model, policy)
+    remaining = list(Post.history.filter(id=post.id).order_by('history_date')
+                     .values_list('history_type', 'nazwa'))
+    assert remaining == [('+', 'Zadanie testowe'), ('~', 'Zmieniona nazwa')]
+    assert prune_history(Post.history.model, policy).removed == 0
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+def _png(size=(2000, 1500)):
+    from io import BytesIO
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile('duzy.png', buffer.getvalue(), content_type='image/png')
+
+def test_image_variants_generated_on_upload(auth_client, media_root):
+    from PIL import Image
+    from core.images import variant_name
+    post = Post.objects.create(nazwa='Z obrazem', image=_png())
+
+    thumb = media_root / variant_name(post.image.name, 'thumb')
+    with Image.open(thumb) as image:
+        assert max(image.size) == 480
+    assert thumb.stat().st_size < post.image.size
+
+    response = auth_client.get('/api/posts/', {'fields': 'id,image_variants'})
+    variants = response.data['results'][0]['image_variants']
+    assert set(variants) == {'thumb', 'medium'}
+    assert variants['thumb'].endswith(variant_name(post.image.name, 'thumb'))
+
+def test_image_variant_rendered_lazily(client, media_root, settings):
+    from core.images import variant_name
+    settings.IMAGE_VARIANTS_ON_UPLOAD = False
+    post = Post.objects.create(nazwa='Z obrazem', image=_png())
+    name = variant_name(post.image.name, 'medium')
+    assert not (media_root / name).exists()
+
+    response = client.get(f'/media/{name}')
+    assert response.status_code == 200
+    assert (media_root / name).exists()
+    assert client.get('/media/variants/medium/post_images/brak.png.webp').status_code == 404
+    assert client.get('/media/variants/medium/../../settings.py.webp').status_code == 404
+
+def test_media_range_and_conditional_requests(client, media_root):
+    post = Post.objects.create(nazwa='Z obrazem', image=_png())
+    url = post.image.url
+    size = post.image.size
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response['Cache-Control']
+    assert response['Accept-Ranges'] == 'bytes'
+    body = b''.join(response.streaming_content)
+    assert len(body) == size
+
+    response = client.get(url, HTTP_RANGE='bytes=10-19')
+    assert response.status_code == 206
+    assert response['Content-Range'] == f'bytes 10-19/{size}'
+    assert b''.join(response.streaming_content) == body[10:20]
+    response = client.get(url, HTTP_RANGE='bytes=-5')
+    assert b''.join(response.streaming_content) == body[-5:]
+    assert client.get(url, HTTP_RANGE=f'bytes={size}-').status_code == 416
+    response = client.get(url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+    assert response.status_code == 200
+
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+def test_media_offload_and_access(auth_client, media_root, settings):
+    post = Post.objects.create(nazwa='Z obrazem', image=_png())
+    settings.MEDIA_OFFLOAD = 'x-accel'
+    settings.MEDIA_ACCESS = 'authenticated'
+
+    assert APIClient().get(post.image.url).status_code == 401
+    response = auth_client.get(post.image.url)
+    assert response.status_code == 200
+    assert response['X-Accel-Redirect'] == f'/protected-media/{post.image.name}'
+    assert response.content == b''
+    assert response['Cache-Control'].startswith('private')
+    assert auth_client.get('/media/history_archive/x.ndjson.gz').status_code == 404
+
+def test_media_signed_links(auth_client, media_root, settings):
+    from urllib.parse import urlencode, urlsplit
+    from posts.media import _signature
+    post = Post.objects.create(nazwa='Z obrazem', image=_png())
+    anonymous = APIClient()
+    assert 'sig=' not in auth_client.get(f'/api/posts/{post.id}/').data['image']
+
+    settings.MEDIA_ACCESS = 'authenticated'
+    data = auth_client.get(f'/api/posts/{post.id}/').data
+    for url in [data['image'], *data['image_variants'].values()]:
+        link = urlsplit(url)
+        assert anonymous.get(link.path).status_code == 401
+        assert anonymous.get(f'{link.path}?{link.query}').status_code == 200
+    link = urlsplit(data['image'])
+    other = post.image.url.replace('.png', '_x.png')
+    assert anonymous.get(f'{other}?{link.query}').status_code == 401
+
+    tampered = link.query.replace('expires=', 'expires=1')
+    assert anonymous.get(f'{link.path}?{tampered}').status_code == 401
+    expired = urlencode({'expires': 1000, 'sig': _signature(post.image.name, 1000)})
+    assert anonymous.get(f'{link.path}?{expired}').status_code == 401
+
+def test_async_read_views(settings, user, post, response_cache):
+    import asyncio
+    from asgiref.sync import async_to_sync
+    from django.test import AsyncRequestFactory
+    from rest_framework.authtoken.models import Token
+    from core.models import Comment
+    from posts.views import PostCommentsViewSet, PostViewSet, UserViewSet
+
+    settings.API_ASYNC_VIEWS = True
+    Comment.objects.create(post=post, author=user, content='Komentarz')
+    factory = AsyncRequestFactory()
+    headers = {'Authorization': 'Token ' + Token.objects.create(user=user).key}
+
+    def call(view, path, **kwargs):
+        assert asyncio.iscoroutinefunction(view)
+        response = async_to_sync(view)(factory.get(path, headers=headers), **kwargs)
+        response.render()
+        return response
+
+    posts = PostViewSet.as_view({'get': 'list', 'post': 'create'})
+    response = call(posts, '/api/posts/')
+    assert response.status_code == 200
+    assert response['X-Cache'] == 'MISS' and 'ETag' in response
+    assert [item['nazwa'] for item in response.data['results']] == ['Zadanie testowe']
+    assert call(posts, '/api/posts/')['X-Cache'] == 'HIT'
+
+    detail = PostViewSet.as_view({'get': 'retrieve'})
+    response = call(detail, f'/api/posts/{post.id}/', pk=post.id)
+    assert response.data['comments'][0]['author'] == 'testuser'
+    assert call(detail, '/api/posts/0/', pk=0).status_code == 404
+
+    comments = PostCommentsViewSet.as_view({'get': 'list'})
+    response = call(comments, f'/api/posts/{post.id}/comments/', post_pk=post.id)
+    assert response.data['results'][0]['content'] == 'Komentarz'
+
+    me = UserViewSet.as_view({'get': 'me'})
+    assert call(me, '/api/users/me/').data['username'] == 'testuser'
+
+    request = factory.post('/api/posts/', {'nazwa': 'x'}, content_type='application/json', headers=headers)
+    response = async_to_sync(posts)(request)
+    assert response.status_code == 403
+
+    settings.API_ASYNC_VIEWS = False
+    assert not asyncio.iscoroutinefunction(PostViewSet.as_view({'get': 'list'}))
+
+def _sse_events(body):
+    import json
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith((':', 'retry')))
+        if fields:
+            events.append((fields['id'], fields['event'], json.loads(fields['data'])))
+    return events
+
+def test_event_stream_replays_from_last_event_id(client, user, post, settings):
+    from core.models import Comment
+    from posts.events import current_cursor, encode_cursor
+    assert client.get('/api/events/', HTTP_ACCEPT='text/event-stream').status_code == 204
+    settings.SSE_WSGI_STREAMING = True
+    settings.SSE_WSGI_TIMEOUT = 0
+    settings.SSE_SAFETY_LAG = 0
+    start = encode_cursor(current_cursor())
+    post.status = 'Aktywny'
+    post.save()
+    Comment.objects.create(post=post, author=user, content='Nowy komentarz')
+    Post.objects.get(nazwa='Zadanie testowe').delete()
+
+    response = client.get('/api/events/', HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID=start)
+    assert response['Content-Type'].startswith('text/event-stream')
+    events = _sse_events(b''.join(response.streaming_content).decode())
+    types = [data['type'] for _, name, data in events]
+    assert types[:2] == ['post.updated', 'comment.created']
+    assert events[0][2]['changes'] == {'status': 'Aktywny'}
+    assert events[1][2]['author'] == 'testuser' and events[1][2]['changes'] == {'content': 'Nowy komentarz'}
+    assert 'post.deleted' in types and 'comment.deleted' in types
+    assert events[-1][1] == 'ready' and events[-1][0] == encode_cursor(current_cursor())
+
+    assert client.get('/api/events/', {'last_event_id': 'x'}, HTTP_ACCEPT='text/event-stream').status_code == 400
+
+def test_event_stream_async_fanout(settings, user, post):
+    import asyncio
+    from asgiref.sync import async_to_sync, sync_to_async
+    from posts.events import broadcaster, stream_async
+    settings.SSE_POLL_INTERVAL = 0.05
+    settings.SSE_SAFETY_LAG = 0
+
+    async def scenario():
+        first, second = stream_async(None), stream_async(None)
+        for stream in (first, second):
+            assert (await anext(stream)).startswith('retry:')
+            assert 'event: ready' in await anext(stream)
+        assert len(broadcaster.subscribers) == 2
+
+        await sync_to_async(Post.objects.create)(nazwa='Na żywo')
+        chunks = await asyncio.gather(anext(first), anext(second))
+        for chunk in chunks:
+            assert '"type":"post.created"' in chunk and 'Na żywo' in chunk
+        await first.aclose()
+        await second.aclose()
+        assert not broadcaster.subscribers
+
+    async_to_sync(scenario)()
+
+def test_event_cursor_holds_back_recent_rows(settings, post):
+    from posts.events import current_cursor, fetch_events
+    settings.SSE_SAFETY_LAG = 0
+    start = current_cursor()
+    newer = Post.objects.create(nazwa='Świeży')
+    created = newer.history.get().history_id
+
+    settings.SSE_SAFETY_LAG = 60
+    assert current_cursor()[0] < created
+    assert fetch_events(start) == []
+
+    settings.SSE_SAFETY_LAG = 0
+    assert current_cursor()[0] == created
+    assert [event['id'] for _, event in fetch_events(start)] == [newer.id]
+
+def test_sync_returns_only_changes_since_token(auth_client, user, post, settings):
+    from core.models import Comment
+    settings.SYNC_SAFETY_LAG = 0
+    other = Post.objects.create(nazwa='Drugi')
+    Comment.objects.create(post=post, author=user, content='Pierwszy')
+
+    response = auth_client.get('/api/sync/')
+    assert {item['nazwa'] for item in response.data['posts']} == {'Zadanie testowe', 'Drugi'}
+    assert len(response.data['comments']) == 1
+    assert response.data['has_more'] is False
+    token = response.data['token']
+
+    response = auth_client.get('/api/sync/', {'since': token})
+    assert response.data['posts'] == [] and response.data['comments'] == []
+    assert response.data['deleted'] == {'posts': [], 'comments': []}
+
+    post.status = 'Aktywny'
+    post.save()
+    other_id = other.id
+    other.delete()
+    response = auth_client.get('/api/sync/', {'since': token})
+    assert [item['status'] for item in response.data['posts']] == ['Aktywny']
+    assert response.data['deleted'] == {'posts': [other_id], 'comments': []}
+
+    assert auth_client.get('/api/sync/', {'since': 'zepsuty'}).status_code == 400
+
+def test_sync_leaves_out_comment_counters(auth_client, user, post, settings):
+    from core.models import Comment
+    settings.SYNC_SAFETY_LAG = 0
+    token = auth_client.get('/api/sync/').data['token']
+    Comment.objects.create(post=post, author=user, content='Nowy')
+
+    response = auth_client.get('/api/sync/', {'since': token})
+    assert [item['post'] for item in response.data['comments']] == [post.id]
+    assert response.data['posts'] == []
+    initial = auth_client.get('/api/sync/').data['posts']
+    assert initial and not set(Post.counter_fields) & set(initial[0])
+
+def test_sync_pages_large_change_sets(auth_client, settings):
+    settings.SYNC_SAFETY_LAG = 0
+    Post.objects.bulk_create([Post(nazwa=f'Post {i}') for i in range(5)])
+    seen, token, has_more = [], None, True
+    while has_more:
+        params = {'page_size': 2, **({'since': token} if token else {})}
+        response = auth_client.get('/api/sync/', params)
+        seen += [item['nazwa'] for item in response.data['posts']]
+        token, has_more = response.data['token'], response.data['has_more']
+    assert sorted(seen) == sorted(f'Post {i}' for i in range(5))
+
+def test_metrics_record_views_and_server_timing(auth_client, post, settings):
+    import os
+    from posts.metrics import registry
+    registry.reset()
+    response = auth_client.get('/api/posts/')
+    timing = dict(part.split(';')[0:2] for part in response['Server-Timing'].split(', '))
+    assert set(timing) == {'db', 'app', 'render', 'total'}
+    assert 'queries' in response['Server-Timing']
+    auth_client.get(f'/api/posts/{post.id}/')
+
+    settings.DEBUG = False
+    assert APIClient().get('/metrics').status_code == 403
+    settings.METRICS_TOKEN = 'sekret'
+    assert APIClient().get('/metrics').status_code == 401
+    assert APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer sekręt').status_code == 401
+    body = APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer sekret').content.decode()
+    pid = f'pid="{os.getpid()}"'
+    assert ('api_request_duration_seconds_count'
+            f'{{view="PostViewSet.list",method="GET",status="200",{pid}}} 1') in body
+    assert ('api_request_db_queries_count'
+            f'{{view="PostViewSet.retrieve",method="GET",status="200",{pid}}} 1') in body
+    assert 'api_response_size_bytes_sum{view="PostViewSet.list"' in body
+    assert f'api_response_cache_misses_total{{{pid}}}' in body
+    assert 'view="metrics_view"' not in body
+
+@pytest.fixture
+def busy_posts(user):
+    from core.models import Comment
+    authors = [User.objects.create_user(username=f'autor{i}', password='x') for i in range(4)]
+    for i in range(5):
+        post = Post.objects.create(nazwa=f'Post {i}', przypisany_uzytkownik=authors[i % 4])
+        Comment.objects.bulk_create(Comment(post=post, author=author, content='...') for author in authors)
+    return post
+
+# Budgets include the token lookup; they must not grow with the number of rows.
+@pytest.mark.parametrize('url, max_queries', [
+    ('/api/posts/', 4),
+    ('/api/posts/?count=0', 3),
+    ('/api/posts/?expand=comments', 5),
+    ('/api/posts/{post}/', 4),
+    ('/api/posts/{post}/comments/', 3),
+])
+def test_endpoint_query_budgets(auth_client, busy_posts, query_budget, url, max_queries):
+    with query_budget(max_queries, repeat_threshold=2):
+        response = auth_client.get(url.format(post=busy_posts.id))
+    assert response.status_code == 200
+
+def test_repeated_queries_are_normalized():
+    from posts.profiling import check_budget, normalize_sql
+    statements = [f'SELECT "username" FROM "auth_user" WHERE "id" = {i}' for i in range(3)]
+    assert normalize_sql(statements[0]) == normalize_sql(statements[2])
+    assert normalize_sql("SELECT 1 WHERE id IN (1, 2, 3) AND name = 'x'") == 'SELECT ? WHERE id IN (...) AND name = ?'
+    problems = check_budget(statements, max_queries=2, repeat_threshold=3)
+    assert problems[0] == '3 zapytań SQL (limit 2)'
+    assert problems[1].startswith('N+1: 3x SELECT "username"')
+
+def test_slow_request_logged_and_profiled(auth_client, post, settings, tmp_path, caplog):
+    settings.SLOW_REQUESTS = {
+        'ENABLED': True, 'MAX_QUERIES': 1, 'PROFILE_DIR': str(tmp_path), 'PROFILE_SAMPLE_RATE': 1.0,
+    }
+    with caplog.at_level('WARNING', logger='posts.profiling'):
+        auth_client.get('/api/posts/')
+    assert 'PostViewSet.list' in caplog.text and 'limit 1' in caplog.text
+    assert [path.suffix for path in tmp_path.iterdir()] == ['.prof']
+
+    caplog.clear()
+    settings.SLOW_REQUESTS['VIEW_BUDGETS'] = {'PostViewSet.list': {'max_queries': 10}}
+    auth_client.get('/api/posts/')
+    assert caplog.text == ''
+
+    for path in tmp_path.iterdir():
+        path.unlink()
+    settings.SLOW_REQUESTS['MAX_DURATION_MS'] = -1
+    assert auth_client.get('/api/nie/ma/').status_code == 404
+    [profile] = tmp_path.iterdir()
+    assert '_api_nie_ma_' in profile.name
+
+def test_generate_dataset_creates_history_and_login_users():
+    from io import StringIO
+    from django.core.management import call_command
+    from core.models import Comment
+    call_command('generate_dataset', posts=30, users=3, batch_size=7, password='haslo123', stdout=StringIO())
+    assert Post.objects.count() == 30
+    assert Post.history.filter(history_type='+').count() == 30
+    assert Comment.history.count() == Comment.objects.count()
+    for post in Post.objects.all():
+        latest = post.history.order_by('-history_date').first()
+        assert (latest.status, latest.updated_at) == (post.status, post.updated_at)
+    assert APIClient().post('/api/login/', {'username': 'synthetic_0', 'password': 'haslo123'}).status_code == 200
+
+def test_benchmark_api_writes_diffable_report(live_server, tmp_path):
+    import json
+    from io import StringIO
+    from django.core.management import call_command
+    call_command('generate_dataset', posts=5, users=2, stdout=StringIO())
+    output = tmp_path / 'bench.json'
+    call_command(
+        'benchmark_api', target=live_server.url, scenario=['post_detail', 'posts_search', 'login'],
+        duration=0.3, warmup=0, concurrency=1, output=str(output), stdout=StringIO(),
+    )
+    report = json.loads(output.read_text())
+    assert sorted(report['scenarios']) == ['login', 'post_detail', 'posts_search']
+    assert all(result['requests'] and not result['errors'] for result in report['scenarios'].values())
+    assert report['meta']['posts'] == 5
+
+def test_comment_counters_follow_comment_writes(user, post):
+    from core.models import Comment
+    other = Post.objects.create(nazwa='Inny')
+    first = Comment.objects.create(post=post, author=user, content='Pierwszy')
+    second = Comment.objects.create(post=post, author=user, content='Drugi')
+    post.refresh_from_db()
+    assert (post.comment_count, post.last_comment_at) == (2, second.created_at)
+
+    stale = Post.objects.get(pk=post.pk)
+    Comment.objects.create(post=post, author=user, content='Trzeci')
+    stale.status = 'Aktywny'
+    stale.save()
+    post.refresh_from_db()
+    assert post.comment_count == 3 and post.status == 'Aktywny'
+
+    second.post = other
+    second.save()
+    first.delete()
+    post.refresh_from_db()
+    other.refresh_from_db()
+    assert post.comment_count == 1
+    assert (other.comment_count, other.last_comment_at) == (1, second.created_at)
+
+def test_deleting_post_skips_per_comment_side_effects(settings, user, post):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from core.models import Comment, Job
+    settings.JOBS_EAGER = False
+    other = Post.objects.create(nazwa='Inny')
+    for target in (post, post, post, other):
+        Comment.objects.create(post=target, author=user, content='Komentarz')
+    Job.objects.all().delete()
+
+    with CaptureQueriesContext(connection) as ctx:
+        post.delete()
+        Post.objects.filter(pk=other.pk).delete()
+    assert not [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_post"')]
+    assert not Job.objects.exists()
+
+def test_repair_counters_fixes_drift(user, post):
+    from io import StringIO
+    from django.core.management import call_command
+    from core.models import Comment
+    Comment.objects.create(post=post, author=user, content='Komentarz')
+    Post.objects.filter(pk=post.pk).update(comment_count=7, last_comment_at=None)
+
+    out = StringIO()
+    call_command('repair_counters', dry_run=True, stdout=out)
+    assert 'Rozbieżne liczniki: 1' in out.getvalue()
+    call_command('repair_counters', stdout=StringIO())
+    post.refresh_from_db()
+    assert post.comment_count == 1 and post.last_comment_at is not None
+
+def test_post_stats_endpoint(auth_client, user, post, query_budget, response_cache):
+    from core.models import Comment
+    Post.objects.create(nazwa='Aktywny', status='Aktywny')
+    Comment.objects.create(post=post, author=user, content='Komentarz')
+    auth_client.get('/api/users/me/')
+
+    with query_budget(2):
+        response = auth_client.get('/api/posts/stats/')
+    assert response.data['posts'] == 2 and response.data['comments'] == 1
+    assert response.data['by_status'] == {'Nowy': 1, 'Aktywny': 1, 'Archiwalny': 0}
+    assert [(item['username'], item['posts'], item['comments']) for item in response.data['by_assignee']] == [
+        ('testuser', 1, 1), (None, 1, 0),
+    ]
+    assert auth_client.get('/api/posts/stats/')['X-Cache'] == 'HIT'
+    assert auth_client.get('/api/posts/stats/', HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    Comment.objects.create(post=post, author=user, content='Drugi')
+    assert auth_client.get('/api/posts/stats/', {'status': 'Nowy'}).data['comments'] == 2
+    listed = auth_client.get('/api/posts/', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert [item['comment_count'] for item in listed.data['results'] if item['id'] == post.id] == [2]
+
+def test_jobs_are_queued_deduplicated_and_run(auth_client, user, post, settings):
+    import threading
+    from core import jobs
+    from core.models import Comment, Job
+    settings.JOBS_EAGER = False
+    Comment.objects.create(post=post, author=user, content='Kabel zasilający')
+    Comment.objects.create(post=post, author=user, content='Drugi komentarz')
+    assert list(Job.objects.values_list('name', 'status')) == [('search.refresh_post', 'queued')]
+    assert auth_client.get('/api/posts/', {'search': 'kabel'}).data['results'] == []
+
+    assert jobs.work(threading.Event(), burst=True) == 1
+    job = Job.objects.get()
+    assert (job.status, job.attempts, job.locked_by != '') == ('done', 1, True)
+    assert [item['id'] for item in auth_client.get('/api/posts/', {'search': 'kabel'}).data['results']] == [post.id]
+
+    settings.DEBUG = True
+    body = APIClient().get('/metrics').content.decode()
+    assert 'api_jobs{name="search.refresh_post",status="done"} 1' in body
+    assert 'api_job_duration_seconds_count{name="search.refresh_post"} 1' in body
+
+def test_failing_job_is_retried_with_backoff(settings, monkeypatch):
+    import threading
+    from datetime import timedelta
+    from django.utils import timezone
+    from core import jobs
+    from core.models import Job
+    settings.JOBS_EAGER = False
+    calls = []
+
+    def flaky(value):
+        calls.append(value)
+        raise RuntimeError('awaria')
+
+    monkeypatch.setitem(jobs.HANDLERS, 'test.flaky', (flaky, 2))
+    job = jobs.enqueue('test.flaky', {'value': 1})
+    before = timezone.now()
+    jobs.work(threading.Event(), burst=True)
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == ('queued', 1)
+    assert before + timedelta(seconds=4) < job.run_at < before + timedelta(seconds=11)
+    assert 'RuntimeError: awaria' in job.last_error
+    assert jobs.work(threading.Event(), burst=True) == 0
+
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    jobs.work(threading.Event(), burst=True)
+    job.refresh_from_db()
+    assert (job.status, job.attempts, calls) == ('failed', 2, [1, 1])
+
+    stuck = jobs.enqueue('test.flaky', {'value': 2})
+    Job.objects.filter(pk=stuck.pk).update(status='running', started_at=timezone.now() - timedelta(hours=1))
+    assert jobs.requeue_stale() == 1
+    assert Job.objects.get(pk=stuck.pk).status == 'queued'
+
+def test_database_settings_per_process():
+    from app.settings import database_settings
+    env = {'DB_HOST': 'db', 'DB_NAME': 'devdb'}
+    web = database_settings('web', env)
+    assert (web['CONN_MAX_AGE'], web['CONN_HEALTH_CHECKS'], web['OPTIONS']) == (60, True, {})
+
+    asgi = database_settings('asgi', {**env, 'ASGI_DB_POOL_MAX_SIZE': '20'})
+    assert asgi['CONN_MAX_AGE'] == 0
+    assert asgi['OPTIONS']['pool'] == {'min_size': 2, 'max_size': 20, 'timeout': 10}
+
+    worker = database_settings('worker', {**env, 'DB_CONN_MAX_AGE': '30', 'WEB_DB_CONN_MAX_AGE': '5'})
+    assert worker['CONN_MAX_AGE'] == 30 and worker['OPTIONS'] == {}
+    assert database_settings('web', {**env, 'DB_POOL': '1'})['CONN_MAX_AGE'] == 0
+
+@pytest.fixture
+def file_database(tmp_path, django_db_blocker):
+    # A file-backed alias outside the test databases: in-memory SQLite
+    # ignores close(), which would hide the reconnects being measured.
+    from django.db import connections
+    connections.settings['bench'] = {
+        **connections.settings['default'], 'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmp_path / 'bench.sqlite3'), 'OPTIONS': {}, 'TEST': {},
+    }
+    with django_db_blocker.unblock():
+        yield 'bench'
+    connections['bench'].close()
+    del connections.settings['bench']
+
+def test_persistent_connections_reused_under_concurrent_load(file_database):
+    from core.loadtest import run_request_cycles
+    fresh = run_request_cycles(threads=4, requests=50, using=file_database, conn_max_age=0)
+    persistent = run_request_cycles(threads=4, requests=50, using=file_database, conn_max_age=60)
+    # One connection per request without reuse, one per worker thread with it;
+    # timings are reported by `manage.py benchmark_connections`, not asserted.
+    assert persistent['requests'] == fresh['requests'] == 200
+    assert fresh['connections'] == 200
+    assert persistent['connections'] == 4
+
+@pytest.fixture
+def replica_database(tmp_path, settings):
+    # A separate SQLite file standing in for a streaming replica; its rows
+    # are written directly, so it can lag behind the primary on purpose.
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connections
+    settings.DB_REPLICA_ALIAS = 'replica'
+    settings.SHARED_CACHE = True
+    settings.API_RESPONSE_CACHE_ENABLED = False
+    connections.settings['replica'] = {
+        **connections.settings['default'], 'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmp_path / 'replica.sqlite3'), 'CONN_MAX_AGE': None, 'OPTIONS': {}, 'TEST': {},
+    }
+    # Connect up front: the test case only lets aliases it declares connect lazily.
+    connections['replica'].connect()
+    call_command('migrate', database='replica', verbosity=0, stdout=StringIO())
+    yield 'replica'
+    connections['replica'].close()
+    del connections.settings['replica']
+
+def test_safe_requests_read_from_replica_until_user_writes(admin_client, replica_database):
+    from django.core.cache import cache
+    from core.routers import ReplicaRouter, read_from
+    Post.objects.create(nazwa='Tylko na primary')
+    Post.objects.using(replica_database).bulk_create([Post(nazwa='Kopia na replice')])
+
+    def names():
+        response = admin_client.get('/api/posts/')
+        assert response.status_code == 200
+        return {item['nazwa'] for item in response.data['results']}
+
+    assert names() == {'Kopia na replice'}
+    response = admin_client.get('/api/export/posts/?output=csv')
+    exported = b''.join(response.streaming_content).decode()
+    assert 'Kopia na replice' in exported and 'Tylko na primary' not in exported
+
+    assert admin_client.post('/api/posts/', {'nazwa': 'Nowy', 'status': 'Nowy'}).status_code == 201
+    assert names() == {'Tylko na primary', 'Nowy'}
+    cache.clear()
+    assert names() == {'Kopia na replice'}
+
+    with read_from(replica_database):
+        assert Post.objects.all().db == replica_database
+        assert ReplicaRouter().db_for_write(Post) == 'default'
+    assert Post.objects.all().db == 'default'
+
+def test_replica_reads_need_shared_pins_and_own_cache_entries(admin_client, replica_database, settings):
+    Post.objects.create(nazwa='Tylko na primary')
+    Post.objects.using(replica_database).bulk_create([Post(nazwa='Kopia na replice')])
+    settings.API_RESPONSE_CACHE_ENABLED = True
+
+    def names(client):
+        response = client.get('/api/posts/')
+        assert response.status_code == 200
+        return {item['nazwa'] for item in response.data['results']}
+
+    assert admin_client.post('/api/posts/', {'nazwa': 'Nowy', 'status': 'Nowy'}).status_code == 201
+    # An unpinned reader caches what the lagging replica has under the new version...
+    assert names(APIClient()) == {'Kopia na replice'}
+    assert APIClient().get('/api/posts/')['X-Cache'] == 'HIT'
+    # ...which the writer, pinned to the primary, must not be served.
+    response = admin_client.get('/api/posts/')
+    assert response['X-Cache'] == 'MISS'
+    assert {item['nazwa'] for item in response.data['results']} == {'Tylko na primary', 'Nowy'}
+
+    settings.SHARED_CACHE = False
+    assert names(APIClient()) == {'Tylko na primary', 'Nowy'}
+
+def test_init_data_is_idempotent_and_short_circuits(settings, tmp_path, query_budget):
+    from io import StringIO
+    from django.core.management import call_command
+    from core.models import Comment
+    settings.MEDIA_ROOT = str(tmp_path)
+    call_command('init_data', stdout=StringIO())
+
+    welcome = Post.objects.get(nazwa__startswith='Jak powstawała')
+    assert User.objects.get(username='admin').check_password('admin123')
+    assert (Post.objects.count(), Comment.objects.count(), welcome.comment_count) == (3, 2, 2)
+    assert Post.history.count() == 3 and welcome.image.name.startswith('post_images/Post1.')
+    assert len(list((tmp_path / 'post_images').iterdir())) == 3
+
+    output = StringIO()
+    with query_budget(2):
+        call_command('init_data', stdout=output)
+    assert 'już istnieją' in output.getvalue()
+
+    welcome.comments.all().delete()
+    call_command('init_data', stdout=StringIO())
+    assert (Post.objects.count(), Comment.objects.count()) == (3, 2)
+    assert len(list((tmp_path / 'post_images').iterdir())) == 3
+
+def test_prepare_app_waits_with_backoff_and_skips_applied_migrations(monkeypatch):
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.utils import OperationalError
+    from core.management.commands import wait_for_db
+    from core.management.commands.prepare_app import pending_migrations
+
+    delays, failures = [], iter([OperationalError('down')] * 3)
+    real_ensure_connection = connection.ensure_connection
+
+    def flaky_ensure_connection():
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        real_ensure_connection()
+
+    monkeypatch.setattr(connection, 'ensure_connection', flaky_ensure_connection)
+    monkeypatch.setattr(wait_for_db.time, 'sleep', delays.append)
+    output = StringIO()
+    call_command('prepare_app', skip_init_data=True, stdout=output)
+    assert delays == [0.1, 0.2, 0.4]
+    assert pending_migrations() == [] and 'pomijam migrate' in output.getvalue()
+
+    failures = iter([OperationalError('down')] * 100)
+    with pytest.raises(OperationalError):
+        wait_for_db.wait_for_database(timeout=0)
+
+def test_search_document_rebuilt_only_when_text_changes(post):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    post = Post.objects.get(pk=post.pk)
+    post.status = 'Aktywny'
+    with CaptureQueriesContext(connection) as captured:
+        post.save()
+    statements = [query['sql'] for query in captured]
+    assert not any('core_comment' in sql or 'search_document' in sql for sql in statements)
+
+    post.nazwa = 'Drukarka nie drukuje'
+    post.save()
+    assert Post.objects.get(pk=post.pk).search_document.startswith('Drukarka nie drukuje')
+
+def test_invalidate_bumps_again_after_commit(django_capture_on_commit_callbacks):
+    from posts.cache import get_versions, invalidate
+    before = get_versions([Post])[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate(Post)
+        assert get_versions([Post])[0] == before + 1
+    assert get_versions([Post])[0] == before + 2
@@ -1,6 +1,7 @@
-from django.urls import path
-from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, UserViewSet, RegisterUserView, CommentViewSet, PostCommentsViewSet
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter, SimpleRouter
+from .views import PostViewSet, UserViewSet, RegisterUserView, CommentViewSet, PostCommentsViewSet, ExportView
+from .views import EventStreamView, SyncView
 
 router = DefaultRouter()
 router.register(r'register', RegisterUserView, basename='register')
@@ -8,7 +9,12 @@ router.register(r'users', UserViewSet, basename='user')
 router.register(r'posts', PostViewSet, basename='post')
 router.register(r'comments', CommentViewSet, basename='comments')
 
-post_comments_router = DefaultRouter()
+post_comments_router = SimpleRouter()
 post_comments_router.register(r'comments', PostCommentsViewSet, basename='post-comments')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('posts/<int:post_pk>/', include(post_comments_router.urls)),
+    path('export/<str:kind>/', ExportView.as_view(), name='export'),
+    path('events/', EventStreamView.as_view(), name='events'),
+    path('sync/', SyncView.as_view(), name='sync'),
+]
@@ -1,13 +1,31 @@
-from rest_framework import viewsets, filters, generics, mixins
+from rest_framework import viewsets, generics, mixins, status
 from core.models import Post, Comment
-from .serializers import PostHistorySerializer
+from .serializers import PostHistorySerializer, PostBulkItemSerializer, PostStatsSerializer
 from .serializers import PostSerializer, RegisterUserSerializer, SimpleUserSerializer, CommentSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly, SAFE_METHODS, BasePermission
-from django.shortcuts import render
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly, SAFE_METHODS, BasePermission
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound, ValidationError
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import F, Q
+from core.export import EXPORTS, FORMATS, export_rows, parse_since, render
+from drf_spectacular.utils import extend_schema
+from .async_views import AsyncReadMixin, aiterate, async_views_enabled
+from .bulk import apply_items, max_items, validate_items
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .events import EventStreamRenderer, decode_cursor, stream_async, stream_sync
+from .filters import FullTextSearchFilter
+from .pagination import KeysetPagination
+from .prefetch import optimize_queryset
+from .replicas import ReplicaReadMixin
+from .stats import post_stats
+from .sync import collect_changes, decode_token, encode_token, initial_state
 
 
 class IsSuperuserOrReadOnly(BasePermission):
@@ -31,6 +49,41 @@ class AllowOptions(IsAuthenticated):
         return super().has_permission(request, view)
 
 
+class EagerLoadingMixin:
+    def get_queryset(self):
+        required = ()
+        if isinstance(self.paginator, KeysetPagination):
+            model_fields = {field.name for field in self.queryset.model._meta.concrete_fields}
+            required = [
+                name for name in (field.lstrip('-') for field in self.paginator.get_ordering(self))
+                if name in model_fields
+            ]
+        return optimize_queryset(super().get_queryset(), self.get_serializer(), required)
+
+
+class SparseFieldsetMixin:
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    expand_by_default_actions = ('retrieve',)
+
+    def _query_list(self, param):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        request = getattr(self, 'request', None)
+        if request is not None and request.method in SAFE_METHODS \
+                and not getattr(self, 'swagger_fake_view', False):
+            kwargs.setdefault('fields', self._query_list(self.fields_query_param))
+            expand = self._query_list(self.expand_query_param)
+            if expand is None and self.action not in self.expand_by_default_actions:
+                expand = []
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+
 class RegisterUserView(mixins.CreateModelMixin,
                           viewsets.GenericViewSet):
     queryset = User.objects.all()
@@ -38,10 +91,11 @@ class RegisterUserView(mixins.CreateModelMixin,
     permission_classes = [AllowAny]
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(EagerLoadingMixin, AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = SimpleUserSerializer
     permission_classes = [AllowOptions]
+    async_actions = ('list', 'retrieve', 'me')
 
     @action(detail=False, methods=['get'], url_path='me')
     def me(self, request):
@@ -49,38 +103,133 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedResponseMixin, EagerLoadingMixin,
+                  SparseFieldsetMixin, AsyncReadMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsSuperuserOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
+    pagination_class = KeysetPagination
+    cache_dependencies = (Post, Comment, User)
+    filter_backends = [FullTextSearchFilter, DjangoFilterBackend]
     filterset_fields = ['id', 'status', 'przypisany_uzytkownik']
-    search_fields = ['nazwa', 'opis']
+    conditional_actions = ('list', 'retrieve', 'stats')
+    cached_actions = ('list', 'retrieve', 'stats')
+
+    def get_history_querysets(self):
+        posts, comments = Post.history.all(), Comment.history.all()
+        if self.lookup_field in self.kwargs:
+            pk = self.kwargs[self.lookup_field]
+            # Every comment ever on this post: one moved away changes it too.
+            ever_here = Comment.history.filter(post_id=pk).values('id')
+            posts, comments = posts.filter(id=pk), comments.filter(id__in=ever_here)
+        # Assignees (and stats) embed usernames and e-mails.
+        querysets = [posts, User.history.all()]
+        # Comment writes change the nested comments and the post counters.
+        if self.action == 'stats' or {'comments', *Post.counter_fields} & set(self.get_serializer().fields):
+            querysets.append(comments)
+        return querysets
+
+    def is_conditional(self, request):
+        # Search hits depend on search_document, which the refresh job rewrites without history.
+        return super().is_conditional(request) and not FullTextSearchFilter().is_searching(request)
+
+    def get_keyset_ordering(self):
+        if FullTextSearchFilter().is_searching(self.request):
+            return ('-search_rank', '-created_at', 'id')
+        return KeysetPagination.ordering
 
     def perform_create(self, serializer):
         serializer.save(przypisany_uzytkownik=self.request.user)
 
+    @extend_schema(responses=PostStatsSerializer)
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        """Status and assignee breakdowns of the (filtered) posts for dashboards."""
+        return self.conditional_response(
+            lambda request: self.cached_response(self.render_stats, request), request,
+        )
+
+    def render_stats(self, request):
+        queryset = self.filter_queryset(Post.objects.all())
+        return Response(PostStatsSerializer(post_stats(queryset)).data)
+
+    @extend_schema(request=PostBulkItemSerializer(many=True))
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'Oczekiwano niepustej listy.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > max_items():
+            return Response(
+                {'detail': f'Maksymalnie {max_items()} elementów w jednym żądaniu.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        validated, errors, posts = validate_items(items)
+        if errors:
+            results = [
+                {'index': index, 'errors': errors[index]} if index in errors else {'index': index}
+                for index in range(len(items))
+            ]
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': apply_items(validated, posts, request.user)})
 
-class PostHistoryListView(generics.ListAPIView):
+
+class PostHistoryListView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = PostHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-history_date', '-history_id')
+
+    def get_history_querysets(self):
+        return [Post.history.filter(id=self.kwargs['pk']), User.history.all()]
 
     def get_queryset(self):
         post_id = self.kwargs['pk']
-        return Post.history.filter(id=post_id)
+        return Post.history.filter(id=post_id).values(
+            *PostHistorySerializer.values(), history_user_name=F('history_user__username'),
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        self.previous_record = None
+        if page:
+            oldest = page[-1]
+            self.previous_record = queryset.filter(
+                Q(history_date__lt=oldest['history_date'])
+                | Q(history_date=oldest['history_date'], history_id__lt=oldest['history_id'])
+            ).order_by(*self.keyset_ordering).first()
+        return page
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['previous_record'] = getattr(self, 'previous_record', None)
+        changes_only = self.request.query_params.get('changes_only', '') if self.request else ''
+        context['changes_only'] = changes_only.lower() in ('1', 'true', 'yes')
+        return context
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('created_at', 'id')
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['post', 'author']
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         if 'post_pk' in self.kwargs:
-            return Comment.objects.filter(post_id=self.kwargs['post_pk'])
-        return Comment.objects.all()
+            return queryset.filter(post_id=self.kwargs['post_pk'])
+        return queryset
+
+    def get_history_querysets(self):
+        comments = Comment.history.all()
+        if self.lookup_field in self.kwargs:
+            comments = comments.filter(id=self.kwargs[self.lookup_field])
+        return [comments, User.history.all()]
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -92,9 +241,109 @@ class CommentViewSet(viewsets.ModelViewSet):
         super().check_object_permissions(request, obj)
 
 
-class PostCommentsViewSet(viewsets.ReadOnlyModelViewSet):
+class PostCommentsViewSet(ReplicaReadMixin, CachedResponseMixin, EagerLoadingMixin, AsyncReadMixin,
+                          viewsets.ReadOnlyModelViewSet):
+    queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('created_at', 'id')
+    cache_dependencies = (Comment, User)
+    cached_actions = ('list',)
 
     def get_queryset(self):
-        return Comment.objects.filter(post_id=self.kwargs['post_pk']).order_by('created_at')
+        return super().get_queryset().filter(post_id=self.kwargs['post_pk']).order_by('created_at')
+
+
+class ExportView(ReplicaReadMixin, APIView):
+    """
+    Stream an export as CSV or NDJSON from a server-side cursor, so memory
+    stays flat however many rows there are. Under ASGI the rows are handed
+    to the server as an async iterator (see `aiterate`).
+    """
+    permission_classes = [IsAdminUser]
+    content_types = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson; charset=utf-8'}
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            raise NotFound()
+        output_format = request.query_params.get('output', 'ndjson')
+        if output_format not in FORMATS:
+            raise ValidationError({'output': f"Dozwolone wartości: {', '.join(FORMATS)}."})
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_since(since)
+            except ValueError:
+                raise ValidationError({'since': 'Niepoprawna data.'})
+
+        # Streamed after the view returns, so bind the rows to the replica explicitly.
+        rows = export_rows(kind, since=since or None, using=self.read_alias)
+        content = render(kind, output_format, rows)
+        if async_views_enabled():
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=self.content_types[output_format])
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{output_format}"'
+        return response
+
+
+class EventStreamView(APIView):
+    """
+    Server-sent events with compact post/comment changes. Resume by sending
+    the last seen event id as `Last-Event-ID` (EventSource does this on
+    reconnect) or `?last_event_id=`.
+
+    Streams are served by the ASGI app. Under WSGI, unless
+    SSE_WSGI_STREAMING is set, the answer is 204, which tells EventSource to
+    stop reconnecting instead of tying up a sync worker per subscriber.
+    """
+    permission_classes = [IsSuperuserOrReadOnly]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    def get(self, request):
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        after = None
+        if last_event_id:
+            try:
+                after = decode_cursor(last_event_id)
+            except ValueError:
+                raise ValidationError({'last_event_id': 'Niepoprawny identyfikator zdarzenia.'})
+
+        if async_views_enabled():
+            stream = stream_async(after)
+        elif getattr(settings, 'SSE_WSGI_STREAMING', False):
+            stream = stream_sync(after)
+        else:
+            return HttpResponse(status=204)
+        response = StreamingHttpResponse(stream, content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class SyncView(APIView):
+    """
+    Incremental sync for offline clients. Without `since` it returns every
+    post and comment; afterwards `since=<token>` returns only what was
+    created, updated or deleted after that token. Keep requesting with the
+    returned `token` while `has_more` is true. Posts come without the
+    comment counters; clients derive them from the synced comments.
+    """
+    permission_classes = [IsSuperuserOrReadOnly]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since:
+            try:
+                state = decode_token(since)
+            except ValueError:
+                raise ValidationError({'since': 'Niepoprawny token synchronizacji.'})
+        else:
+            state = initial_state()
+
+        page_size = KeysetPagination().get_page_size(request)
+        payload, state, has_more = collect_changes(state, page_size, self.get_serializer_context())
+        return Response({**payload, 'token': encode_token(state), 'has_more': has_more})
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'format': self.format_kwarg, 'view': self}
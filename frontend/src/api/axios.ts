@@ -4,4 +4,16 @@ const api = axios.create({
   baseURL: process.env.REACT_APP_API_URL || 'http://127.0.0.1:8002',
 });
 
-export default api;
\ No newline at end of file
+// Collection endpoints are keyset-paginated: follow `next` until the last page.
+export async function fetchAll<T = any>(url: string, params: Record<string, any> = {}): Promise<T[]> {
+  const items: T[] = [];
+  let res = await api.get(url, { params: { page_size: 100, ...params } });
+  items.push(...res.data.results);
+  while (res.data.next) {
+    res = await api.get(res.data.next);
+    items.push(...res.data.results);
+  }
+  return items;
+}
+
+export default api;
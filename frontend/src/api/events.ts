@@ -0,0 +1,22 @@
+import api from './axios';
+
+export interface ChangeEvent {
+  type: string;
+  id?: number;
+  post_id?: number;
+  author?: string;
+  author_id?: number;
+  at?: string;
+  changes?: Record<string, any>;
+}
+
+// Subscribes to /api/events/. EventSource reconnects on its own and resumes
+// with Last-Event-ID; a 'reset' event means the gap was too large and the
+// caller should refetch. A backend without the ASGI server answers 204, which
+// makes EventSource give up for good, so pages simply get no live updates.
+export function subscribeToEvents(onEvent: (event: ChangeEvent) => void): () => void {
+  const source = new EventSource(`${api.defaults.baseURL}/api/events/`);
+  source.addEventListener('change', (e) => onEvent(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener('reset', () => onEvent({ type: 'reset' }));
+  return () => source.close();
+}
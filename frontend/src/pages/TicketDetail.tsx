@@ -1,7 +1,8 @@
 import { useState, useEffect, useContext } from 'react';
 import { useParams, Link, useNavigate} from 'react-router-dom';
-import api from '../api/axios';
+import api, { fetchAll } from '../api/axios';
 import { AuthContext } from '../context/AuthContext';
+import { subscribeToEvents } from '../api/events';
 import { toast } from 'react-toastify';
 import { jsPDF } from 'jspdf';
 import html2canvas from 'html2canvas';
@@ -35,11 +36,9 @@ export default function TicketDetail() {
         setTicket(ticketRes.data);
         console.log('Ticket:', ticketRes.data);
 
-        const commentsRes = await api.get('/api/comments/', {
-          params: { post: Number(id) }
-        });
-        setComments(commentsRes.data);
-        console.log('Komentarze:', commentsRes.data);
+        const allComments = await fetchAll('/api/comments/', { post: Number(id) });
+        setComments(allComments);
+        console.log('Komentarze:', allComments);
       } catch (err: any) {
         console.error('Błąd szczegółów ticketa:', err);
       } finally {
@@ -50,6 +49,28 @@ export default function TicketDetail() {
     fetchData();
   }, [id]);
 
+  useEffect(() => {
+    const postId = Number(id);
+    return subscribeToEvents((event) => {
+      if (event.type === 'post.updated' && event.id === postId) {
+        setTicket((prev: any) => (prev ? { ...prev, ...event.changes } : prev));
+      } else if (event.type === 'post.deleted' && event.id === postId) {
+        toast.info('Ten post został usunięty');
+        navigate('/');
+      } else if (event.type === 'comment.created' && event.post_id === postId) {
+        setComments(prev => (prev.some(c => c.id === event.id) ? prev : [
+          ...prev,
+          { id: event.id, post: postId, author: event.author, author_id: event.author_id,
+            created_at: event.at, updated_at: event.at, ...event.changes },
+        ]));
+      } else if (event.type === 'comment.updated' && event.post_id === postId) {
+        setComments(prev => prev.map(c => (c.id === event.id ? { ...c, ...event.changes } : c)));
+      } else if (event.type === 'comment.deleted' && event.post_id === postId) {
+        setComments(prev => prev.filter(c => c.id !== event.id));
+      }
+    });
+  }, [id, navigate]);
+
   const handleDeletePost = async () => {
     if (!window.confirm("CZY NA PEWNO chcesz trwale usunąć ten post?")) {
       return;
@@ -84,10 +105,7 @@ export default function TicketDetail() {
 
       setNewComment('');
 
-      const res = await api.get('/api/comments/', {
-        params: { post: Number(id) }
-      });
-      setComments(res.data);
+      setComments(await fetchAll('/api/comments/', { post: Number(id) }));
 
       console.log('Nowy komentarz dodany, odświeżono listę');
     } catch (err: any) {
@@ -220,7 +238,7 @@ export default function TicketDetail() {
           {ticket.image && (
           <div className="mb-4 overflow-hidden rounded-4 shadow-sm">
             <img
-              src={ticket.image}
+              src={ticket.image_variants?.medium || ticket.image}
               alt={ticket.nazwa}
               className="img-fluid w-100"
               style={{ maxHeight: '400px', objectFit: 'cover' }}
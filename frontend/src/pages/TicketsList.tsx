@@ -2,6 +2,7 @@ import { useContext, useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../api/axios';
 import { AuthContext } from '../context/AuthContext';
+import { subscribeToEvents } from '../api/events';
 
 export default function TicketsList() {
   const { token, logout } = useContext(AuthContext)!;
@@ -13,9 +14,16 @@ export default function TicketsList() {
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('');
 
-  const [page, setPage] = useState(1);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [prevCursor, setPrevCursor] = useState<string | null>(null);
+  const [totalCount, setTotalCount] = useState(0);
+  const [newPosts, setNewPosts] = useState(0);
   const pageSize = 12;
 
+  const cursorFromUrl = (url: string | null) =>
+    url ? new URL(url).searchParams.get('cursor') : null;
+
   useEffect(() => {
     const delayDebounceFn = setTimeout(() => {
       setSearchTerm(searchInput);
@@ -39,7 +47,7 @@ export default function TicketsList() {
   };
 
   useEffect(() => {
-    setPage(1);
+    setCursor(null);
   }, [searchTerm, statusFilter]);
 
   const fetchTickets = async () => {
@@ -49,12 +57,16 @@ export default function TicketsList() {
     try {
       const res = await api.get('/api/posts/', {
         params: {
-          _nocache: Date.now(),
           search: searchTerm,
-          status: statusFilter
+          status: statusFilter,
+          page_size: pageSize,
+          cursor: cursor || undefined
         }
       });
-      setTickets(res.data || []);
+      setTickets(res.data.results || []);
+      setTotalCount(res.data.count ?? 0);
+      setNextCursor(cursorFromUrl(res.data.next));
+      setPrevCursor(cursorFromUrl(res.data.previous));
     } catch (err: any) {
       console.error('Błąd pobierania ticketów:', err);
       setError('Nie udało się pobrać listy postów.');
@@ -65,15 +77,33 @@ export default function TicketsList() {
 
   useEffect(() => {
     fetchTickets();
-  }, [logout, searchTerm, statusFilter]);
+  }, [logout, searchTerm, statusFilter, cursor]);
+
+  useEffect(() => {
+    return subscribeToEvents((event) => {
+      if (event.type === 'post.updated') {
+        setTickets(prev => prev.map(t => (t.id === event.id ? { ...t, ...event.changes } : t)));
+      } else if (event.type === 'post.deleted') {
+        setTickets(prev => prev.filter(t => t.id !== event.id));
+        setTotalCount(prev => Math.max(prev - 1, 0));
+      } else if (event.type === 'post.created' || event.type === 'reset') {
+        setNewPosts(prev => prev + 1);
+      } else if (event.type === 'comment.created' || event.type === 'comment.deleted') {
+        const delta = event.type === 'comment.created' ? 1 : -1;
+        setTickets(prev => prev.map(t => (t.id === event.post_id
+          ? { ...t, comment_count: Math.max((t.comment_count ?? 0) + delta, 0) } : t)));
+      }
+    });
+  }, []);
 
   const handleRefresh = () => {
     setLoading(true);
+    setNewPosts(0);
     fetchTickets();
   };
 
-  const handlePageChange = (newPage: number) => {
-    setPage(newPage);
+  const handlePageChange = (newCursor: string | null) => {
+    setCursor(newCursor);
     window.scrollTo({ top: 0, behavior: 'smooth' });
   };
 
@@ -86,10 +116,6 @@ export default function TicketsList() {
     }
   }
 
-  const startIndex = (page - 1) * pageSize;
-  const endIndex = startIndex + pageSize;
-  const currentTickets = tickets.slice(startIndex, endIndex);
-  const totalPages = Math.ceil(tickets.length / pageSize);
 
   if (error && tickets.length === 0) {
     return (
@@ -121,6 +147,7 @@ export default function TicketsList() {
             )}
             <button onClick={handleRefresh} className="btn btn-outline-light rounded-pill px-4 py-2" disabled={loading}>
               {loading ? 'Odświeżanie...' : 'Odśwież'}
+              {newPosts > 0 && <span className="badge bg-light text-primary ms-2">+{newPosts}</span>}
             </button>
           </div>
         </div>
@@ -128,7 +155,7 @@ export default function TicketsList() {
 
       <div className="d-flex flex-column flex-md-row gap-3 mb-4 align-items-md-center justify-content-between">
         <h3 className="fw-bold text-dark m-0">
-          Najnowsze wpisy <small className="text-muted fs-6 fw-normal">({tickets.length})</small>
+          Najnowsze wpisy <small className="text-muted fs-6 fw-normal">({totalCount})</small>
         </h3>
 
         <div className="d-flex gap-2 flex-grow-1 justify-content-md-end">
@@ -170,14 +197,15 @@ export default function TicketsList() {
       ) : (
         <>
             <div className="row g-4" style={{ opacity: loading ? 0.5 : 1, transition: 'opacity 0.2s' }}>
-            {currentTickets.map((ticket) => (
+            {tickets.map((ticket) => (
                 <div key={ticket.id} className="col-md-6 col-lg-4">
                 <div className="card h-100 overflow-hidden border-0 shadow-sm">
                     {/* ZDJĘCIE */}
                     <div style={{ height: '200px', overflow: 'hidden', position: 'relative' }}>
                     {ticket.image ? (
                         <img
-                        src={ticket.image}
+                        src={ticket.image_variants?.thumb || ticket.image}
+                        loading="lazy"
                         alt={ticket.nazwa}
                         className="w-100 h-100"
                         style={{ objectFit: 'cover', transition: 'transform 0.3s ease' }}
@@ -206,6 +234,10 @@ export default function TicketsList() {
                         <i className="bi bi-clock me-1"></i>
                         {calculateReadingTime(ticket.opis || '')} min.
                         </span>
+                        <span className="text-muted small fw-medium">
+                        <i className="bi bi-chat me-1"></i>
+                        {ticket.comment_count ?? 0}
+                        </span>
                     </div>
                     <h5 className="card-title fw-bold mb-2">
                         <Link to={`/tickets/${ticket.id}`} className="text-decoration-none text-dark stretched-link">
@@ -228,40 +260,25 @@ export default function TicketsList() {
             ))}
             </div>
 
-            {totalPages > 1 && (
+            {(nextCursor || prevCursor) && (
                 <div className="d-flex justify-content-center mt-5">
                     <nav aria-label="Page navigation">
                         <ul className="pagination shadow-sm">
-                            <li className={`page-item ${page === 1 ? 'disabled' : ''}`}>
+                            <li className={`page-item ${!prevCursor ? 'disabled' : ''}`}>
                                 <button
                                     className="page-link border-0 rounded-start-pill px-3"
-                                    onClick={() => handlePageChange(page - 1)}
-                                    disabled={page === 1}
+                                    onClick={() => handlePageChange(prevCursor)}
+                                    disabled={!prevCursor}
                                 >
                                     <i className="bi bi-chevron-left"></i>
                                 </button>
                             </li>
 
-                            {[...Array(totalPages)].map((_, index) => {
-                                const pageNum = index + 1;
-                                return (
-                                    <li key={pageNum} className={`page-item ${page === pageNum ? 'active' : ''}`}>
-                                        <button
-                                            className="page-link border-0"
-                                            onClick={() => handlePageChange(pageNum)}
-                                            style={{ zIndex: 0 }}
-                                        >
-                                            {pageNum}
-                                        </button>
-                                    </li>
-                                );
-                            })}
-
-                            <li className={`page-item ${page === totalPages ? 'disabled' : ''}`}>
+                            <li className={`page-item ${!nextCursor ? 'disabled' : ''}`}>
                                 <button
                                     className="page-link border-0 rounded-end-pill px-3"
-                                    onClick={() => handlePageChange(page + 1)}
-                                    disabled={page === totalPages}
+                                    onClick={() => handlePageChange(nextCursor)}
+                                    disabled={!nextCursor}
                                 >
                                     <i className="bi bi-chevron-right"></i>
                                 </button>
@@ -1,6 +1,6 @@
 import { useState, useEffect, useContext } from 'react';
 import { Link } from 'react-router-dom';
-import api from '../api/axios';
+import api, { fetchAll } from '../api/axios';
 import { AuthContext } from '../context/AuthContext';
 import { toast } from 'react-toastify';
 
@@ -22,10 +22,7 @@ export default function UserProfile() {
 
     const fetchHistory = async () => {
       try {
-        const res = await api.get('/api/comments/', {
-          params: { author: user.id }
-        });
-        setMyComments(res.data);
+        setMyComments(await fetchAll('/api/comments/', { author: user.id }));
       } catch (err) {
         console.error('Błąd pobierania historii:', err);
       } finally {